@@ -1,33 +1,32 @@
-import os
 import webbrowser
 import threading
 import re
-import requests
-import random
-import time
 import logging
 from flask import Flask, jsonify, request, render_template, send_from_directory, redirect, url_for
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 
 from src.utils.key_management import save_api_keys, load_api_keys
-from src.services.ai_clients import initialize_ai_clients, flash_model, pro_model, call_ai, openai_model_default, OPENAI_ENABLED
+from src.services.ai_clients import initialize_ai_clients, get_router_stats, get_prompt_cache_stats, get_usage_stats
 from src.data.data_manager import (
     offers,
-    next_offer_id,
     save_offer,
     delete_offer_from_storage,
     backup_offers,
     get_storage_stats,
     get_next_available_offer_id,
 )
-from src.core.offer_processing import (
-    check_duplicate_offer,
-    check_existing_accounts_with_same_bank,
-)
-from src.core.scraping import scrape_and_process_url, process_manual_content
+from src.core.offer_processing import check_duplicate_offer
+from src.core.scraping import scrape_and_process_url, process_manual_content, reset_offer_for_processing
+from src.core.field_refresh import refresh_field_value, refresh_fields
+from src.core.recrawl import recrawl_scheduler
+from src.core.http_pool import session_pool
+from src.core.host_limiter import host_limiter
+from src.core.cpu_pool import get_cpu_pool_stats
+from src.core.http_cache import http_cache
 from src.core.plan_generation import PlanGeneration
-from src.utils.config import FIELD_EXTRACTION_TASKS, USER_AGENTS, CONTEXT_SIZE
+from src.utils.config import FIELD_EXTRACTION_TASKS, RECRAWL_ENABLED
+from src.services.usage_tracking import usage_tracker, offer_usage, merge_usage
+from src.services.replay import replay_stats
 
 
 load_dotenv()
@@ -150,17 +149,8 @@ def handle_offers():
             
             offer_to_refresh = offers[refresh_offer_id]
             
-            # Reset the offer to processing state
-            offer_to_refresh['status'] = 'processing'
-            offer_to_refresh['processing_step'] = 'Validating Content' if 'original_content' in offer_to_refresh else 'Scraping Website'
-            offer_to_refresh['details'] = {field['param_name']: 'Processing...' for field in FIELD_EXTRACTION_TASKS + [{"param_name": "additional_considerations"}]}
-            
-            # Clear any existing refresh status
-            if 'refresh_status' in offer_to_refresh:
-                del offer_to_refresh['refresh_status']
-            
-            # Save the updated offer to storage
-            save_offer(refresh_offer_id)
+            # Reset the offer to processing state and save it
+            reset_offer_for_processing(refresh_offer_id)
             
             # Start processing thread based on offer type
             if 'original_content' in offer_to_refresh:
@@ -221,9 +211,8 @@ def handle_offers():
     return jsonify(list(offers.values()))
 
 
-@app.route('/api/offers/<int:offer_id>/refresh', methods=['POST'])
-def refresh_offer_field(offer_id):
-    """Rescrapes the website and re-queries a specific field."""
+def _refresh_unavailable(offer_id):
+    """Error response when a refresh can't run for the offer, otherwise None."""
     if offer_id not in offers:
         return jsonify({'error': 'Offer not found'}), 404
     
@@ -232,6 +221,15 @@ def refresh_offer_field(offer_id):
     from src.services.ai_clients import OPENAI_ENABLED, flash_model, pro_model
     if not OPENAI_ENABLED and not flash_model and not pro_model:
         return jsonify({'error': 'No AI clients configured. Please configure OpenAI or Gemini API keys.'}), 500
+    return None
+
+
+@app.route('/api/offers/<int:offer_id>/refresh', methods=['POST'])
+def refresh_offer_field(offer_id):
+    """Rescrapes the website and re-queries a specific field."""
+    unavailable = _refresh_unavailable(offer_id)
+    if unavailable:
+        return unavailable
     
     data = request.get_json()
     field_name = data.get('field')
@@ -248,347 +246,30 @@ def refresh_offer_field(offer_id):
     return jsonify({'status': 'refreshing', 'field': field_name}), 202
 
 
-def clear_refresh_status(offer_id, field_name):
-    """Helper function to clear refresh status for a field."""
-    if 'refresh_status' in offers[offer_id] and field_name in offers[offer_id]['refresh_status']:
-        del offers[offer_id]['refresh_status'][field_name]
-
-
-def refresh_field_value(offer_id, field_name):
-    """Rescrapes and re-queries a specific field value."""
-    global offers
+@app.route('/api/offers/<int:offer_id>/refresh-fields', methods=['POST'])
+def refresh_offer_fields(offer_id):
+    """Rescrapes the website once and re-queries several fields against it."""
+    unavailable = _refresh_unavailable(offer_id)
+    if unavailable:
+        return unavailable
     
-    try:
-        # Set a flag to indicate refresh is in progress without changing the actual value
-        if 'refresh_status' not in offers[offer_id]:
-            offers[offer_id]['refresh_status'] = {}
-        offers[offer_id]['refresh_status'][field_name] = 'rescraping'
-        
-        # Check if this is a manual mode offer (has stored content)
-        if 'original_content' in offers[offer_id]:
-            page_text = offers[offer_id]['original_content']
-        else:
-            # Rescrape the website
-            url = offers[offer_id]['url']
-            session = requests.Session()
-            headers = {
-                'User-Agent': random.choice(USER_AGENTS),
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-                'Accept-Language': 'en-US,en;q=0.9',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'DNT': '1',
-            }
-            response = session.get(url, headers=headers, timeout=15, allow_redirects=True)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            body_content = soup.body
-            if body_content:
-                for script_or_style in body_content(["script", "style"]):
-                    script_or_style.decompose()
-                page_text = " ".join(body_content.stripped_strings)
-            else:
-                page_text = ""
-        
-        if not page_text:
-            print(f"❌ No content found for offer {offer_id}, setting field '{field_name}' to N/A")
-            offers[offer_id]['details'][field_name] = 'N/A'
-            
-            # Clear refresh status before returning
-            clear_refresh_status(offer_id, field_name)
-            return
-        
-
-        
-        # Brief pause to ensure status is visible
-        time.sleep(0.3)
-        
-        # Get the prompt for the specific field
-        field_prompt = None
-        for task in FIELD_EXTRACTION_TASKS:
-            if task["param_name"] == field_name:
-                field_prompt = task["prompt"]
-                break
-        
-        if not field_prompt:
-            offers[offer_id]['details'][field_name] = 'N/A'
-            
-            # Clear refresh status before returning
-            clear_refresh_status(offer_id, field_name)
-            return
-        
-        # Check for existing accounts if this is the additional_considerations field
-        existing_accounts_context = ""
-        if field_name == "additional_considerations":
-            bank_name = offers[offer_id]['details'].get('bank_name', '')
-            existing_accounts = check_existing_accounts_with_same_bank(bank_name, offer_id)
-            
-            if existing_accounts:
-                existing_accounts_context = f"""
-IMPORTANT CONTEXT: The user has {len(existing_accounts)} existing opened account(s) with {bank_name}:
-{chr(10).join([f"- {account['account_title']} (ID: {account['id']})" for account in existing_accounts])}
-
-This information is crucial because many bank offers are restricted to "new customers only" or have specific eligibility requirements for existing customers. Pay special attention to any terms about:
-- New customer requirements
-- Existing customer restrictions
-- Eligibility for current account holders
-- Whether the offer applies to existing customers
-- Any special terms for current account holders
-"""
-        
-        # Send 3 queries to get different perspectives
-        query_prompt = f"""
-        Based on the following text from a bank offer website, answer this specific question:
-        {field_prompt}
-        {existing_accounts_context}
-        
-        Provide only the answer, without any extra explanation.
-        
-        --- WEBSITE TEXT START ---
-        {page_text[-CONTEXT_SIZE:]}
-        --- WEBSITE TEXT END ---
-        """
-        
-        # Send 3 parallel queries
-        offers[offer_id]['refresh_status'][field_name] = 'querying'
-        start_query_time = time.time()
-        
-        def query_ai(query_num):
-            # Use OpenAI as fallback when Gemini models are not available
-            if field_name == "additional_considerations":
-                model_to_use = openai_model_default
-                use_long_tokens = True
-            else:
-                # Try to use pro_model if available, otherwise fall back to OpenAI
-                model_to_use = pro_model if pro_model else openai_model_default
-                use_long_tokens = False
-            result = call_ai(query_prompt, model_to_use, use_short_tokens=not use_long_tokens, temperature=0.5)
-            return result.strip()
-        
-        # Run queries in parallel
-        query_threads = []
-        results = [None, None, None]
-        
-        def run_query(index):
-            results[index] = query_ai(index + 1)
-        
-        for i in range(3):
-            thread = threading.Thread(target=run_query, args=(i,))
-            query_threads.append(thread)
-            thread.start()
-        
-        for thread in query_threads:
-            thread.join()
-        
-        query_duration = time.time() - start_query_time
-        
-        # Brief pause to ensure status is visible
-        time.sleep(0.3)
-        
-        # Send consensus query
-        offers[offer_id]['refresh_status'][field_name] = 'consensus'
-        start_consensus_time = time.time()
-        # Determine if this field expects a numeric value
-        numeric_fields = [
-            'minimum_daily_balance_required', 'minimum_deposit_amount', 'initial_deposit_amount',
-            'bonus_to_be_received', 'minimum_monthly_fee', 'num_required_deposits',
-            'days_for_deposit', 'days_for_bonus', 'must_be_open_for', 'total_deposit_required'
-        ]
-        
-        is_numeric_field = field_name in numeric_fields
-        
-        if is_numeric_field:
-            # Special handling for minimum_daily_balance_required
-                if field_name == 'minimum_daily_balance_required':
-                    consensus_prompt = f"""
-                    I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the original website content and the 3 AI responses:
-                    
-                    Question: {field_prompt}
-                    {existing_accounts_context}
-                    
-                    Answer 1: {results[0]}
-                    Answer 2: {results[1]}
-                    Answer 3: {results[2]}
-                    
-                    --- ORIGINAL WEBSITE CONTENT START ---
-                    {page_text[-CONTEXT_SIZE:]}
-                    --- ORIGINAL WEBSITE CONTENT END ---
-                    
-                    CRITICAL: This field is for minimum_daily_balance_required. You MUST extract ONLY a single dollar amount.
-                    
-                    RULES:
-                    1. If there are multiple balance requirements (e.g., checking vs savings), prioritize the CHECKING account requirement
-                    2. Extract ONLY the dollar amount, no text, no parentheses, no explanations
-                    3. Examples: "$1,500 (checking)" → "1500", "$300 savings" → "300", "1500" → "1500"
-                    4. If no clear balance requirement is found, respond with "0"
-                    5. Do NOT include multiple values or ranges
-                    
-                    Provide ONLY the numeric value for the checking account minimum daily balance requirement.
-                    """
-                else:
-                    consensus_prompt = f"""
-                    I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the original website content and the 3 AI responses:
-                    
-                    Question: {field_prompt}
-                    {existing_accounts_context}
-                    
-                    Answer 1: {results[0]}
-                    Answer 2: {results[1]}
-                    Answer 3: {results[2]}
-                    
-                    --- ORIGINAL WEBSITE CONTENT START ---
-                    {page_text[-CONTEXT_SIZE:]}
-                    --- ORIGINAL WEBSITE CONTENT END ---
-                    
-                    IMPORTANT: This field expects a NUMERIC value. Extract ONLY the relevant number from the most accurate answer.
-                    
-                    For minimum_deposit_amount: Extract only the dollar amount (e.g., "1000" from "$1,000")
-                    For bonus amounts: Extract only the dollar amount (e.g., "300" from "$300")
-                    For fees: Extract only the dollar amount (e.g., "0" from "$0" or "waived")
-                    For counts/days: Extract only the number (e.g., "90" from "90 days")
-                    
-                    If multiple values exist, choose the most relevant one based on the field context.
-                    Provide ONLY the numeric value, no text, no explanation.
-                    """
-        else:
-            consensus_prompt = f"""
-            I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the original website content and the 3 AI responses:
-            
-            Question: {field_prompt}
-            {existing_accounts_context}
-            
-            Answer 1: {results[0]}
-            Answer 2: {results[1]}
-            Answer 3: {results[2]}
-            
-            --- ORIGINAL WEBSITE CONTENT START ---
-            {page_text[-CONTEXT_SIZE:]}
-            --- ORIGINAL WEBSITE CONTENT END ---
-            
-            Consider the context from the original website content and choose the most accurate answer. If the answers are similar, choose the most specific one. If they conflict significantly, choose the most reasonable answer based on the original content and typical bank offer patterns.
-            
-            Provide only the final answer, without explanation.
-            """
-        
-        # Use OpenAI as fallback when Gemini models are not available
-        if field_name == "additional_considerations":
-            model_to_use = openai_model_default
-            use_long_tokens = True
-        else:
-            # Try to use pro_model if available, otherwise fall back to OpenAI
-            model_to_use = pro_model if pro_model else openai_model_default
-            use_long_tokens = False
-        final_result = call_ai(consensus_prompt, model_to_use, use_short_tokens=not use_long_tokens)
-        consensus_duration = time.time() - start_consensus_time
-        print(f"  Consensus Response: '{final_result.strip()}'")
-        
-        # Post-process numeric fields to ensure clean numeric values
-        if is_numeric_field:
-            cleaned_result = final_result.strip()
-            # Remove common non-numeric text and extract just the number
-            if field_name == 'minimum_daily_balance_required':
-                # Extract the first dollar amount found - prioritize checking account requirements
-                if 'checking' in cleaned_result.lower():
-                    # Look for checking account balance requirement first
-                    checking_match = re.search(r'checking.*?\$?([0-9,]+)', cleaned_result, re.IGNORECASE)
-                    if checking_match:
-                        cleaned_result = checking_match.group(1).replace(',', '')
-                    else:
-                        # Fall back to any dollar amount
-                        dollar_match = re.search(r'\$?([0-9,]+)', cleaned_result)
-                        if dollar_match:
-                            cleaned_result = dollar_match.group(1).replace(',', '')
-                else:
-                    # Extract any dollar amount found
-                    dollar_match = re.search(r'\$?([0-9,]+)', cleaned_result)
-                    if dollar_match:
-                        cleaned_result = dollar_match.group(1).replace(',', '')
-                
-                if cleaned_result == final_result.strip():  # No change made
-                    if '0' in cleaned_result.lower() or 'none' in cleaned_result.lower():
-                        cleaned_result = '0'
-                    elif 'n/a' in cleaned_result.lower():
-                        cleaned_result = 'N/A'
-                        
-            elif field_name in ['days_for_deposit', 'days_for_bonus', 'must_be_open_for', 'num_required_deposits']:
-                # Extract just the number
-                number_match = re.search(r'([0-9]+)', cleaned_result)
-                if number_match:
-                    cleaned_result = number_match.group(1)
-                elif 'n/a' in cleaned_result.lower():
-                    cleaned_result = 'N/A'
-                    
-            elif field_name in ['minimum_monthly_fee', 'minimum_deposit_amount', 'initial_deposit_amount', 'bonus_to_be_received', 'total_deposit_required']:
-                # Extract dollar amount
-                dollar_match = re.search(r'\$?([0-9,]+\.?[0-9]*)', cleaned_result)
-                if dollar_match:
-                    cleaned_result = dollar_match.group(1).replace(',', '')
-                elif '0' in cleaned_result.lower() or 'none' in cleaned_result.lower() or 'waived' in cleaned_result.lower():
-                    cleaned_result = '0'
-            
-            print(f"  Cleaned numeric result: '{cleaned_result}'")
-            
-            # Additional validation for numeric fields
-            if field_name == 'minimum_daily_balance_required':
-                # Ensure we have a valid numeric result
-                if not cleaned_result.isdigit() and cleaned_result != '0' and cleaned_result != 'N/A':
-                    print(f"  ⚠️ Warning: Invalid numeric result for {field_name}, attempting to extract again...")
-                    # Try one more extraction attempt
-                    final_extraction = re.search(r'([0-9]+)', cleaned_result)
-                    if final_extraction:
-                        cleaned_result = final_extraction.group(1)
-                        print(f"  ✅ Final extraction successful: '{cleaned_result}'")
-                    else:
-                        cleaned_result = '0'
-            
-            offers[offer_id]['details'][field_name] = cleaned_result
-        else:
-            # Special handling for additional_considerations to ensure proper formatting
-            if field_name == 'additional_considerations':
-                result = final_result.strip()
-                # If the result doesn't contain newlines, try to split by consideration types
-                if '\n' not in result:
-                    consideration_regex = re.compile(r'(WARNING:|CAUTION:|GOOD:)')
-                    parts = consideration_regex.split(result)
-                    
-                    # Reconstruct with newlines
-                    reconstructed = ''
-                    for i, part in enumerate(parts):
-                        if re.match(r'^(WARNING:|CAUTION:|GOOD:)$', part):
-                            # This is a consideration type, add it to the reconstructed string
-                            if reconstructed and not reconstructed.endswith('\n'):
-                                reconstructed += '\n'
-                            reconstructed += part
-                        elif part.strip():
-                            # This is the content, add it after the type with a space
-                            reconstructed += ' ' + part.strip()
-                    
-                    result = reconstructed
-                
-                offers[offer_id]['details'][field_name] = result
-            else:
-                offers[offer_id]['details'][field_name] = final_result.strip()
-        
-        # Save the updated offer to storage
-        save_offer(offer_id)
-        
-        # Keep status visible for a moment before clearing
-        time.sleep(1.5)
-        
-        # Clear refresh status
-        clear_refresh_status(offer_id, field_name)
-        
-    except Exception as e:
-        print(f"❌ Error refreshing field {field_name} for offer {offer_id}: {e}")
-        offers[offer_id]['details'][field_name] = 'Refresh Failed'
-        # Save the failed offer to storage
-        save_offer(offer_id)
-        
-        # Clear refresh status on error
-        if 'refresh_status' in offers[offer_id] and field_name in offers[offer_id]['refresh_status']:
-            del offers[offer_id]['refresh_status'][field_name]
+    data = request.get_json() or {}
+    field_names = data.get('fields')
+    if not field_names or not isinstance(field_names, list):
+        return jsonify({'error': 'A non-empty list of field names is required'}), 400
+    if not all(isinstance(field_name, str) for field_name in field_names):
+        return jsonify({'error': 'Field names must be strings'}), 400
+    
+    invalid = [field_name for field_name in field_names if field_name not in offers[offer_id]['details']]
+    if invalid:
+        return jsonify({'error': f"Invalid field name(s): {', '.join(invalid)}"}), 400
+    field_names = list(dict.fromkeys(field_names))
+    
+    # Start refresh process in background
+    thread = threading.Thread(target=refresh_fields, args=(offer_id, field_names))
+    thread.start()
+    
+    return jsonify({'status': 'refreshing', 'fields': field_names}), 202
 
 
 @app.route('/api/offers/<int:offer_id>', methods=['GET', 'PUT', 'DELETE'])
@@ -628,6 +309,7 @@ def handle_single_offer(offer_id):
         
     if request.method == 'DELETE':
         del offers[offer_id]
+        usage_tracker.discard(offer_id)
         # Delete the offer from storage
         delete_offer_from_storage(offer_id)
         return jsonify({'message': 'Offer deleted successfully'}), 200
@@ -642,6 +324,73 @@ def get_storage_statistics():
     return jsonify(stats)
 
 
+@app.route('/api/ai/providers', methods=['GET'])
+def get_provider_statistics():
+    """Get circuit breaker states and hedging counters for the AI providers."""
+    return jsonify(get_router_stats())
+
+
+@app.route('/api/scraping/pool-stats', methods=['GET'])
+def get_pool_statistics():
+    """Get how often scrapes reused a pooled session and an open connection."""
+    return jsonify(session_pool.stats())
+
+
+@app.route('/api/scraping/fetch-stats', methods=['GET'])
+def get_fetch_statistics():
+    """Get active and queued page fetches per host and how long fetches waited for a slot."""
+    return jsonify(host_limiter.stats())
+
+
+@app.route('/api/scraping/cpu-pool-stats', methods=['GET'])
+def get_cpu_pool_statistics():
+    """Get how many parsing and ranking tasks ran in worker processes versus inline."""
+    return jsonify(get_cpu_pool_stats())
+
+
+@app.route('/api/scraping/cache-stats', methods=['GET'])
+def get_http_cache_statistics():
+    """Get how many page fetches were served fresh from the HTTP cache, revalidated, or downloaded."""
+    return jsonify(http_cache.stats())
+
+
+@app.route('/api/recrawl/status', methods=['GET'])
+def get_recrawl_status():
+    """Get background re-crawl progress: pages checked, unchanged, changed and due."""
+    return jsonify(recrawl_scheduler.stats())
+
+
+@app.route('/api/replay/status', methods=['GET'])
+def get_replay_status():
+    """Get the record/replay mode and how many pages and completions its archive holds."""
+    return jsonify(replay_stats())
+
+
+@app.route('/api/ai/cache-stats', methods=['GET'])
+def get_prompt_cache_statistics():
+    """Get how much of the prompt traffic was served from the provider's prefix cache."""
+    return jsonify(get_prompt_cache_stats())
+
+
+@app.route('/api/offers/<int:offer_id>/usage', methods=['GET'])
+def get_offer_usage(offer_id):
+    """Get token counts, latency and cost for an offer, broken down by stage and model."""
+    if offer_id not in offers:
+        return jsonify({'error': 'Offer not found'}), 404
+    usage = offer_usage(offers[offer_id], offer_id)
+    return jsonify(usage or merge_usage(None, {}))
+
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage_statistics():
+    """Get usage summed over stored offers, plus totals for AI calls made since startup."""
+    stored = None
+    for offer in offers.values():
+        if offer.get('usage'):
+            stored = merge_usage(stored, offer['usage'])
+    return jsonify({'offers': stored or merge_usage(None, {}), 'since_startup': get_usage_stats()})
+
+
 @app.route('/api/planning/generate', methods=['POST'])
 def generate_plan():
     """Generate a plan for unopened offers."""
@@ -697,6 +446,9 @@ def main():
         webbrowser.open_new('http://127.0.0.1:5000/')
     threading.Timer(1, open_browser).start()
 
+    if RECRAWL_ENABLED:
+        recrawl_scheduler.start()
+
     app.run(debug=True, use_reloader=False)
 
 if __name__ == '__main__':
@@ -0,0 +1,160 @@
+"""Serves the fixture offer pages as bank-style HTML with configurable latency, errors and 429s.
+
+    python benchmarks/fakes/fake_bank_site.py --port 8702 --latency 0.2 --rate-limit-rate 0.05
+
+Pages are at /offers/<fixture name without .txt>, e.g. /offers/offer_chase_checking.
+Any other path under /offers/ returns a 404 page.
+"""
+import argparse
+import html
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'offer_pages')
+
+# Navigation, scripts and styles the scraper has to strip, as on a real bank site
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<title>{title}</title>
+<style>body {{ font-family: sans-serif; }} .nav a {{ margin: 0 8px; }}</style>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+</head>
+<body>
+<nav class="nav"><a href="/">Personal</a><a href="/business">Business</a><a href="/login">Sign in</a></nav>
+<main>
+<h1>{title}</h1>
+{paragraphs}
+</main>
+<footer><p>Privacy | Security | Accessibility | Site map</p></footer>
+<script src="/static/analytics.js"></script>
+</body>
+</html>
+"""
+
+
+def load_pages(fixture_dir=FIXTURE_DIR):
+    """Render every fixture file as an HTML page keyed by its name."""
+    pages = {}
+    for filename in sorted(os.listdir(fixture_dir)):
+        if not filename.endswith('.txt'):
+            continue
+        with open(os.path.join(fixture_dir, filename), encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        title = html.escape(lines[0]) if lines else filename
+        paragraphs = "\n".join(f"<p>{html.escape(line)}</p>" for line in lines[1:])
+        pages[filename[:-4]] = PAGE_TEMPLATE.format(title=title, paragraphs=paragraphs)
+    return pages
+
+
+class FakeBankConfig:
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, rate_limit_rate=0.0, retry_after=1,
+                 seed=None, fixture_dir=FIXTURE_DIR):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.pages = load_pages(fixture_dir)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'connections': 0}
+
+    def roll(self):
+        with self.lock:
+            self.stats['requests'] += 1
+            value = self.random.random()
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        delay = max(0.0, self.latency + jitter)
+        if value < self.rate_limit_rate:
+            with self.lock:
+                self.stats['rate_limited'] += 1
+            return 429, delay
+        if value < self.rate_limit_rate + self.error_rate:
+            with self.lock:
+                self.stats['errors'] += 1
+            return 503, delay
+        return 200, delay
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            with config.lock:
+                config.stats['connections'] += 1
+
+        def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path == '/stats':
+                self._send(200, json.dumps(config.stats), content_type='application/json')
+                return
+            status, delay = config.roll()
+            time.sleep(delay)
+            if status == 429:
+                self._send(429, "<html><body>Too Many Requests</body></html>",
+                           headers={'Retry-After': str(config.retry_after)})
+                return
+            if status != 200:
+                self._send(status, "<html><body>Service Unavailable</body></html>")
+                return
+            name = path[len('/offers/'):] if path.startswith('/offers/') else None
+            if name in config.pages:
+                self._send(200, config.pages[name])
+            else:
+                self._send(404, "<html><body><h1>Page Not Found</h1><p>We're sorry, this page doesn't exist.</p></body></html>")
+
+    return Handler
+
+
+def start_server(port=0, **config_kwargs):
+    """Start the server on a background thread. Returns (server, config)."""
+    config = FakeBankConfig(**config_kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8702)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+    server, config = start_server(args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                  rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Fake bank site on {base}")
+    for name in config.pages:
+        print(f"  {base}/offers/{name}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
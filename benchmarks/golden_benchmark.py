@@ -0,0 +1,184 @@
+"""Field accuracy of the extraction pipeline against golden offer pages, next to its token and call cost.
+
+Runs the saved bank pages in fixtures/golden/pages through
+process_manual_content one at a time, so each goes through the same HTML to
+text and boilerplate removal as a scraped page, and compares every
+FIELD_EXTRACTION_TASKS field with the expected values in
+fixtures/golden/expected.json.
+
+LLM traffic goes through recorded responses so runs are repeatable and free:
+
+    # record once per configuration (needs a real OpenAI key)
+    python benchmarks/golden_benchmark.py --record
+    # replay
+    python benchmarks/golden_benchmark.py
+    # compare a cheaper configuration
+    python benchmarks/golden_benchmark.py --record --no-light-model --recordings data/replay/no_light.zip
+
+Recordings go in a src.services.replay archive, data/replay/golden.zip by
+default. They are not committed: an accuracy figure only means something
+for the model that answered, so record with a real key and keep the
+archive with the results it produced. Pages are processed sequentially so
+every run sends the same requests in the same order. A replay that hits a
+request with no recording exits with status 1 and reports no accuracy,
+since the missing answers would be scored as wrong.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rule_extraction import NUMERIC_FIELDS, YES_NO_FIELDS, normalize_answer  # noqa: E402
+from src.services import ai_clients, replay  # noqa: E402
+from src.services.usage_tracking import usage_tracker  # noqa: E402
+from src.utils.config import FIELD_EXTRACTION_TASKS  # noqa: E402
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(BENCHMARK_DIR, 'fixtures', 'golden', 'pages')
+EXPECTED_PATH = os.path.join(BENCHMARK_DIR, 'fixtures', 'golden', 'expected.json')
+RECORDINGS_PATH = os.path.join(os.path.dirname(BENCHMARK_DIR), 'data', 'replay', 'golden.zip')
+
+
+def _amounts(text):
+    return {float(value.replace(',', '')) for value in re.findall(r"\d[\d,]*(?:\.\d+)?", text or "")}
+
+
+def field_matches(field_name, expected, actual):
+    """Compare one extracted value with its expected value. Returns None when the field isn't scored."""
+    if expected is None:
+        return None
+    actual = (actual or "").strip()
+    if isinstance(expected, dict):
+        if 'contains' in expected:
+            return all(part.lower() in actual.lower() for part in expected['contains'])
+        if 'amounts' in expected:
+            return set(map(float, expected['amounts'])) <= _amounts(actual)
+        raise ValueError(f"Unknown expectation for {field_name}: {expected}")
+    if expected.lower() == 'single tier':
+        return 'single tier' in actual.lower()
+    if field_name in YES_NO_FIELDS:
+        answer = re.match(r"\W*(yes|no)\b", actual, re.IGNORECASE)
+        return bool(answer) and answer.group(1).lower() == expected.lower()
+    if field_name in NUMERIC_FIELDS:
+        return normalize_answer(field_name, actual) == normalize_answer(field_name, expected)
+    return actual.strip(' .').lower() == expected.lower()
+
+
+def apply_configuration(args):
+    """Switch pipeline features off for this run."""
+    from src.core import offer_processing
+    if args.no_rules:
+        offer_processing.settled_fields = lambda page_text: {}
+    if args.no_light_model:
+        offer_processing.LIGHT_MODEL_FIELDS = []
+    if args.model:
+        ai_clients.openai_model_default = args.model
+
+
+def run(args):
+    with open(EXPECTED_PATH, encoding='utf-8') as f:
+        expected = json.load(f)
+
+    real_client = None
+    if args.record:
+        from openai import OpenAI
+        from src.utils.key_management import load_api_keys
+        openai_api_key, _ = load_api_keys()
+        real_client = OpenAI(api_key=openai_api_key or os.environ.get('OPENAI_API_KEY'))
+    elif not os.path.exists(args.recordings):
+        print(f"No recordings at {args.recordings} (run with --record first)", file=sys.stderr)
+        return 1
+    archive = replay.configure_replay('record' if args.record else 'replay', args.recordings)
+    ai_clients.client = replay.RecordReplayClient(archive, real_client=real_client)
+    ai_clients.OPENAI_ENABLED = True
+    ai_clients.flash_model = None
+    ai_clients.pro_model = None
+    apply_configuration(args)
+
+    from src.data.data_manager import offers, get_next_available_offer_id, delete_offer_from_storage
+    from src.core.scraping import process_manual_content
+
+    per_field = defaultdict(lambda: [0, 0])
+    page_rows = []
+    total_started = time.monotonic()
+    for page_name in sorted(expected):
+        with open(os.path.join(PAGES_DIR, page_name + '.html'), encoding='utf-8') as f:
+            page_html = f.read()
+        offer_id = get_next_available_offer_id()
+        offers[offer_id] = {
+            'id': offer_id, 'url': f"golden-{page_name}",
+            'user_controlled': {'opened': False, 'deposited': False, 'received': False, 'selected_tier': None},
+            'status': 'processing', 'processing_step': 'Validating Content',
+            'details': {task['param_name']: 'Processing...' for task in FIELD_EXTRACTION_TASKS},
+            'original_content': page_html,
+        }
+        before = usage_tracker.snapshot()['totals']
+        started = time.monotonic()
+        try:
+            process_manual_content(page_html, offer_id)
+            details = dict(offers[offer_id]['details'])
+            status = offers[offer_id]['status']
+        finally:
+            offers.pop(offer_id, None)
+            delete_offer_from_storage(offer_id)
+        elapsed = time.monotonic() - started
+        after = usage_tracker.snapshot()['totals']
+
+        correct = scored = 0
+        for field_name, expected_value in expected[page_name].items():
+            match = field_matches(field_name, expected_value, details.get(field_name))
+            if match is None:
+                continue
+            scored += 1
+            correct += match
+            per_field[field_name][0] += match
+            per_field[field_name][1] += 1
+            if not match and args.verbose:
+                print(f"  {page_name}.{field_name}: expected {expected_value!r}, got {details.get(field_name)!r}")
+        page_rows.append((page_name, status, correct, scored, after['calls'] - before['calls'],
+                          after['prompt_tokens'] - before['prompt_tokens'],
+                          after['completion_tokens'] - before['completion_tokens'], elapsed))
+    total_elapsed = time.monotonic() - total_started
+    archive.save()
+    if archive.misses:
+        print(f"Missing recordings: {archive.misses} (re-run with --record for this configuration)", file=sys.stderr)
+        return 1
+
+    print(f"\n{'page':30s} {'status':10s} {'correct':>9s} {'calls':>6s} {'in tok':>8s} {'out tok':>8s} {'secs':>7s}")
+    for name, status, correct, scored, calls, tokens_in, tokens_out, elapsed in page_rows:
+        print(f"{name:30s} {status:10s} {correct:4d}/{scored:<4d} {calls:6d} {tokens_in:8d} {tokens_out:8d} {elapsed:7.2f}")
+
+    print(f"\n{'field':32s} accuracy")
+    for field_name in [task['param_name'] for task in FIELD_EXTRACTION_TASKS]:
+        if field_name in per_field:
+            correct, scored = per_field[field_name]
+            print(f"{field_name:32s} {correct}/{scored}")
+
+    totals = usage_tracker.snapshot()['totals']
+    correct = sum(value[0] for value in per_field.values())
+    scored = sum(value[1] for value in per_field.values())
+    print(f"\nAccuracy: {correct}/{scored} ({correct / scored:.1%})" if scored else "\nAccuracy: n/a")
+    print(f"Calls: {totals['calls']}, prompt tokens: {totals['prompt_tokens']}, "
+          f"completion tokens: {totals['completion_tokens']}, cost: ${totals['cost_usd']:.4f}, "
+          f"wall time: {total_elapsed:.1f}s")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--record', action='store_true', help='call the real API and save responses')
+    parser.add_argument('--recordings', default=RECORDINGS_PATH)
+    parser.add_argument('--no-rules', action='store_true', help='send every field to the LLM')
+    parser.add_argument('--no-light-model', action='store_true', help='use the default model for every field')
+    parser.add_argument('--model', help='override the default OpenAI model')
+    parser.add_argument('--verbose', action='store_true', help='print every mismatch')
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
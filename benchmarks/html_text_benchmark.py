@@ -0,0 +1,98 @@
+"""Speed and peak memory of src.core.html_text against the BeautifulSoup extraction it replaced.
+
+Every fixture page from the fake bank site is padded out like a heavy bank
+marketing page (inline script bundles, CSS, an SVG icon sprite and a mega
+menu), and then converted to text both ways:
+
+    python benchmarks/html_text_benchmark.py --repeat 20 --padding 400
+
+Peak memory is measured with tracemalloc for one conversion of the largest
+page. It also reports whether html_text without boilerplate removal gives
+the same text as BeautifulSoup for the unpadded pages, and how much text
+boilerplate removal takes off.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from benchmarks.fakes.fake_bank_site import load_pages  # noqa: E402
+from src.core.html_text import LXML_AVAILABLE, html_to_text, page_content  # noqa: E402
+
+
+def beautifulsoup_text(html):
+    """The extraction the scraper used before html_text."""
+    soup = BeautifulSoup(html, 'html.parser')
+    body_content = soup.body
+    if not body_content:
+        return ""
+    for script_or_style in body_content(["script", "style"]):
+        script_or_style.decompose()
+    return " ".join(body_content.stripped_strings)
+
+
+def pad_page(html, padding_kb):
+    """Add the non-content weight a real bank page carries."""
+    script = "<script>" + "window.__APP_STATE__.push({id: 1, label: 'x', items: [1, 2, 3]});\n" * (padding_kb * 8) + "</script>"
+    style = "<style>" + ".c-card__title--primary { color: #123456; margin: 0 auto; }\n" * (padding_kb * 4) + "</style>"
+    sprite = "<svg style=\"display:none\">" + "".join(
+        f"<symbol id=\"icon-{i}\"><title>icon {i}</title><path d=\"M0 0h24v24H0z\"/></symbol>" for i in range(padding_kb)) + "</svg>"
+    menu = "<nav class=\"mega\">" + "".join(
+        f"<ul><li><a href=\"/p/{i}\">Products {i}</a></li><li><a href=\"/h/{i}\">Help {i}</a></li></ul>" for i in range(padding_kb // 4)) + "</nav>"
+    return html.replace("<body>", "<body>" + style + sprite + menu, 1).replace("</body>", script + "</body>", 1)
+
+
+def time_per_page(convert, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            convert(html)
+    return (time.perf_counter() - started) / (repeat * len(pages))
+
+
+def peak_memory(convert, html):
+    tracemalloc.start()
+    try:
+        convert(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(args):
+    pages = load_pages()
+    mismatches = [name for name, html in pages.items() if beautifulsoup_text(html) != html_to_text(html, reduce=False)]
+    heavy = [pad_page(html, args.padding) for html in pages.values()]
+    largest = max(heavy, key=len)
+    print(f"{len(heavy)} pages, average {sum(map(len, heavy)) / len(heavy) / 1024:.0f} KB, "
+          f"html_text parser: {'lxml' if LXML_AVAILABLE else 'html.parser'}")
+    print(f"\n{'method':22s} {'ms/page':>9s} {'peak MB':>9s}")
+    results = {}
+    for name, convert in (('beautifulsoup', beautifulsoup_text), ('html_text', html_to_text)):
+        seconds = time_per_page(convert, heavy, args.repeat)
+        peak = peak_memory(convert, largest)
+        results[name] = seconds
+        print(f"{name:22s} {seconds * 1000:9.2f} {peak / 1024 / 1024:9.2f}")
+    print(f"\nSpeedup: {results['beautifulsoup'] / results['html_text']:.1f}x")
+    print(f"Unpadded pages with different text: {len(mismatches)}" + (f" ({', '.join(mismatches)})" if mismatches else ""))
+    for label, sample in (('unpadded', pages.values()), ('padded', heavy)):
+        reductions = [page_content(html) for html in sample]
+        original = sum(result['original_chars'] for result in reductions)
+        kept = sum(result['kept_chars'] for result in reductions)
+        print(f"Boilerplate removal on {label} pages: {original} -> {kept} chars ({1 - kept / original:.1%} removed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--padding', type=int, default=200, help='roughly how many KB of markup to add to each page')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
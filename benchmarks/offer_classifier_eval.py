@@ -0,0 +1,65 @@
+"""Measure the local offer classifier against labelled fixture pages.
+
+Fixture files are named offer_*.txt or not_offer_*.txt. Reports precision
+and recall of the local accept and reject decisions; uncertain pages are
+the ones that still go to the LLM.
+
+The classifier's rules were written against fixtures/classifier_tuning;
+fixtures/offer_pages is the held-out evaluation set and the default here.
+
+    python benchmarks/offer_classifier_eval.py [fixture_dir]
+    python benchmarks/offer_classifier_eval.py --tuning
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.offer_classifier import classify_offer_page  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_FIXTURES = os.path.join(FIXTURES_DIR, 'offer_pages')
+TUNING_FIXTURES = os.path.join(FIXTURES_DIR, 'classifier_tuning')
+
+
+def _ratio(numerator, denominator):
+    return f"{numerator / denominator:.2f}" if denominator else "n/a"
+
+
+def evaluate(fixture_dir=DEFAULT_FIXTURES):
+    counts = {'pages': 0, 'offers': 0, 'non_offers': 0, 'accepted': 0, 'offers_accepted': 0,
+              'rejected': 0, 'non_offers_rejected': 0}
+    for filename in sorted(os.listdir(fixture_dir)):
+        if not filename.endswith('.txt'):
+            continue
+        is_offer = not filename.startswith('not_offer')
+        with open(os.path.join(fixture_dir, filename), encoding='utf-8') as f:
+            verdict, reason = classify_offer_page(f.read())
+        print(f"{filename:45s} {'offer' if is_offer else 'not_offer':10s} -> {verdict:10s} {reason or ''}")
+
+        counts['pages'] += 1
+        counts['offers'] += is_offer
+        counts['non_offers'] += not is_offer
+        if verdict == 'offer':
+            counts['accepted'] += 1
+            counts['offers_accepted'] += is_offer
+        elif verdict == 'not_offer':
+            counts['rejected'] += 1
+            counts['non_offers_rejected'] += not is_offer
+
+    decided = counts['accepted'] + counts['rejected']
+    print()
+    print(f"Pages: {counts['pages']}, decided locally: {decided}, sent to LLM: {counts['pages'] - decided}")
+    # A wrong local decision is never seen by the LLM, so precision matters more than recall
+    print(f"Accept: {counts['accepted']} page(s), precision {_ratio(counts['offers_accepted'], counts['accepted'])}, "
+          f"recall {_ratio(counts['offers_accepted'], counts['offers'])}")
+    print(f"Reject: {counts['rejected']} page(s), precision {_ratio(counts['non_offers_rejected'], counts['rejected'])}, "
+          f"recall {_ratio(counts['non_offers_rejected'], counts['non_offers'])}")
+    return counts
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        evaluate(TUNING_FIXTURES if sys.argv[1] == '--tuning' else sys.argv[1])
+    else:
+        evaluate(DEFAULT_FIXTURES)
@@ -0,0 +1,282 @@
+"""End-to-end latency harness for the offer pipeline, run against local stand-ins.
+
+Starts the fake OpenAI server and fake bank site (unless URLs for running
+ones are given), points the AI client at the fake API, and then:
+
+  1. runs scrape_and_process_url for --offers offers at --concurrency
+  2. runs refresh_field_value for --refreshes field refreshes at --concurrency
+
+It reports percentiles for each AI stage (one sample per provider call),
+each processing step as the UI sees it, and each whole offer or refresh,
+plus throughput and how many offers and refreshes ended each way. Offers
+turned away as not being offer pages count as rejected, not failed.
+Processing step times include the pipeline's short UI hold delays. Offers
+created by the run are deleted from storage afterwards. Exits with status 1
+if any offer or refresh failed.
+
+    python benchmarks/pipeline_harness.py --offers 40 --concurrency 8 --llm-latency 0.5 --llm-error-rate 0.02
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI  # noqa: E402
+
+from benchmarks.fakes import fake_bank_site, fake_openai  # noqa: E402
+from src.core.host_limiter import host_limiter  # noqa: E402
+from src.services import ai_clients  # noqa: E402
+from src.services.provider_router import is_failed_response  # noqa: E402
+from src.services.usage_tracking import usage_tracker  # noqa: E402
+from src.utils.config import FIELD_EXTRACTION_TASKS  # noqa: E402
+
+REFRESH_FIELDS = ['bonus_to_be_received', 'minimum_deposit_amount', 'days_for_deposit', 'fee_is_conditional']
+# What field_refresh writes into the field when a refresh fails outright
+REFRESH_FAILED_VALUE = 'Refresh Failed'
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'name':28s} {'n':>5s} {'p50':>8s} {'p90':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}")
+    for name, samples in sorted(rows.items()):
+        if not samples:
+            continue
+        cells = [percentile(samples, pct) for pct in (50, 90, 95, 99)] + [max(samples)]
+        print(f"  {name:28s} {len(samples):5d} " + " ".join(f"{value:8.3f}" for value in cells))
+
+
+class StepMonitor:
+    """Polls offers and records how long each processing step and refresh status lasts."""
+
+    def __init__(self, offers, interval=0.01):
+        self.offers = offers
+        self.interval = interval
+        self.watched = set()
+        self.current = {}
+        self.durations = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def watch(self, offer_id):
+        with self._lock:
+            self.watched.add(offer_id)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        now = time.monotonic()
+        for key, (state, started) in self.current.items():
+            if state:
+                self.durations[state].append(now - started)
+
+    def _states(self, offer):
+        states = {('step', None): f"step: {offer.get('processing_step')}"}
+        for field, status in (offer.get('refresh_status') or {}).items():
+            states[('refresh', field)] = f"refresh: {status}"
+        return states
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            with self._lock:
+                watched = list(self.watched)
+            for offer_id in watched:
+                offer = self.offers.get(offer_id)
+                if not offer:
+                    continue
+                states = self._states(offer)
+                keys = set(states) | {key[1:] for key in self.current if key[0] == offer_id}
+                for key in keys:
+                    state = states.get(key)
+                    previous, started = self.current.get((offer_id,) + key, (None, now))
+                    if state != previous:
+                        if previous:
+                            self.durations[previous].append(now - started)
+                        self.current[(offer_id,) + key] = (state, now)
+            time.sleep(self.interval)
+
+
+def new_offer_record(offer_id, url):
+    """Same initial record the API creates for a new URL offer."""
+    return {
+        'id': offer_id, 'url': url,
+        'user_controlled': {'opened': False, 'deposited': False, 'received': False, 'selected_tier': None},
+        'status': 'processing',
+        'processing_step': 'Scraping Website',
+        'details': {field['param_name']: 'Processing...'
+                    for field in FIELD_EXTRACTION_TASKS + [{"param_name": "additional_considerations"}]},
+    }
+
+
+def offer_outcome(offer):
+    """'completed', 'rejected' when the page was judged not to be an offer, else 'failed'."""
+    if offer['status'] == 'failed' and offer.get('processing_step') == 'Validation Failed':
+        return 'rejected'
+    return 'completed' if offer['status'] == 'completed' else 'failed'
+
+
+def refresh_outcome(value):
+    """'failed' when the refresh errored or stored the AI's error text as the value, else 'refreshed'."""
+    return 'failed' if value == REFRESH_FAILED_VALUE or is_failed_response(value) else 'refreshed'
+
+
+def configure_ai(openai_url):
+    ai_clients.client = OpenAI(api_key='fake-key', base_url=openai_url)
+    ai_clients.OPENAI_ENABLED = True
+    ai_clients.flash_model = None
+    ai_clients.pro_model = None
+
+
+def run(args):
+    servers = []
+    if args.openai_url:
+        openai_url = args.openai_url
+    else:
+        server, _ = fake_openai.start_server(latency=args.llm_latency, jitter=args.llm_latency / 4,
+                                             error_rate=args.llm_error_rate, rate_limit_rate=args.llm_429_rate,
+                                             seed=args.seed)
+        servers.append(('openai', server))
+        openai_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    if args.site_url:
+        site_url = args.site_url.rstrip('/')
+        page_names = args.pages.split(',') if args.pages else ['offer_chase_checking']
+        site_stats = None
+    else:
+        server, site_config = fake_bank_site.start_server(latency=args.site_latency, jitter=args.site_latency / 4,
+                                                          error_rate=args.site_error_rate,
+                                                          rate_limit_rate=args.site_429_rate, seed=args.seed)
+        servers.append(('site', server))
+        site_url = f"http://127.0.0.1:{server.server_address[1]}"
+        page_names = args.pages.split(',') if args.pages else sorted(site_config.pages)
+        site_stats = site_config.stats
+
+    configure_ai(openai_url)
+    # Every fake page is on one host, so lift the politeness pacing meant for real banks
+    host_limiter.requests_per_second = args.site_rps
+    host_limiter.burst = max(host_limiter.burst, args.concurrency)
+
+    # Imported late so the AI client is configured before the pipeline modules load
+    from src.data.data_manager import offers, get_next_available_offer_id, delete_offer_from_storage
+    from src.core.scraping import scrape_and_process_url
+    from src.core.field_refresh import refresh_field_value
+
+    rng = random.Random(args.seed)
+    monitor = StepMonitor(offers)
+    monitor.start()
+    created = []
+    created_lock = threading.Lock()
+    offer_times = []
+    refresh_times = []
+    refresh_outcomes = []
+
+    def process_one(index):
+        url = f"{site_url}/offers/{page_names[index % len(page_names)]}?run={index}"
+        with created_lock:
+            offer_id = get_next_available_offer_id()
+            offers[offer_id] = new_offer_record(offer_id, url)
+            created.append(offer_id)
+        monitor.watch(offer_id)
+        started = time.monotonic()
+        scrape_and_process_url(url, offer_id)
+        offer_times.append(time.monotonic() - started)
+        return offer_outcome(offers[offer_id])
+
+    try:
+        print(f"Processing {args.offers} offers at concurrency {args.concurrency}...")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            offer_outcomes = list(executor.map(process_one, range(args.offers)))
+        offer_wall = time.monotonic() - started
+
+        completed = [offer_id for offer_id in created if offers[offer_id]['status'] == 'completed']
+        refresh_jobs = [(rng.choice(completed), rng.choice(REFRESH_FIELDS)) for _ in range(args.refreshes)] if completed else []
+
+        def refresh_one(job):
+            offer_id, field_name = job
+            started = time.monotonic()
+            refresh_field_value(offer_id, field_name)
+            refresh_times.append(time.monotonic() - started)
+            refresh_outcomes.append(refresh_outcome(offers[offer_id]['details'].get(field_name)))
+
+        refresh_wall = 0.0
+        if refresh_jobs:
+            print(f"Refreshing {len(refresh_jobs)} fields at concurrency {args.concurrency}...")
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(refresh_one, refresh_jobs))
+            refresh_wall = time.monotonic() - started
+    finally:
+        monitor.stop()
+        for offer_id in created:
+            offers.pop(offer_id, None)
+            delete_offer_from_storage(offer_id)
+        for _, server in servers:
+            server.shutdown()
+
+    offer_counts = defaultdict(int)
+    for outcome in offer_outcomes:
+        offer_counts[outcome] += 1
+    refresh_counts = defaultdict(int)
+    for outcome in refresh_outcomes:
+        refresh_counts[outcome] += 1
+    print_table("AI call latency by stage (s)", usage_tracker.latency_samples())
+    print_table("Processing steps (s)", monitor.durations)
+    print_table("End to end (s)", {'offer': offer_times, 'refresh': refresh_times})
+    print()
+    print(f"Offers: {dict(offer_counts)} in {offer_wall:.2f}s ({args.offers / offer_wall:.2f} offers/s)")
+    if refresh_jobs:
+        print(f"Refreshes: {dict(refresh_counts)} in {refresh_wall:.2f}s "
+              f"({len(refresh_jobs) / refresh_wall:.2f} refreshes/s)")
+    totals = usage_tracker.snapshot()['totals']
+    print(f"AI calls: {totals['calls']}, prompt tokens: {totals['prompt_tokens']}, "
+          f"completion tokens: {totals['completion_tokens']}")
+    print(f"Router: {ai_clients.get_router_stats()['stats']}")
+    if site_stats is not None:
+        print(f"Bank site: {site_stats}")
+    print(f"Fetcher: {host_limiter.stats()}")
+
+    if offer_counts['failed'] or refresh_counts['failed']:
+        print(f"\n{offer_counts['failed']} offer(s) and {refresh_counts['failed']} refresh(es) failed")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--offers', type=int, default=20)
+    parser.add_argument('--refreshes', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--pages', help='comma-separated page names on the bank site (default: all fixtures)')
+    parser.add_argument('--openai-url', help='use an already running OpenAI-compatible server')
+    parser.add_argument('--site-url', help='use an already running bank site')
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-429-rate', type=float, default=0.0)
+    parser.add_argument('--site-latency', type=float, default=0.2)
+    parser.add_argument('--site-error-rate', type=float, default=0.0)
+    parser.add_argument('--site-429-rate', type=float, default=0.0)
+    parser.add_argument('--site-rps', type=float, default=100.0, help='per-host request rate allowed by the fetcher')
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Sequence
+
+from src.utils.config import (
+    CONTEXT_SIZE,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_PASSAGE_WORDS,
+    FIELD_EXTRACTION_TASKS,
+)
+from src.utils.tokens import count_tokens
+from src.core.cpu_pool import run_cpu
+
+# Words that carry no signal for ranking passages against field prompts.
+# The second half are instruction words that appear in nearly every prompt.
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for',
+    'from', 'has', 'have', 'how', 'if', 'in', 'is', 'it', 'its', 'like', 'many',
+    'may', 'more', 'must', 'of', 'on', 'or', 'our', 'that', 'the', 'their', 'then',
+    'there', 'these', 'this', 'to', 'was', 'what', 'when', 'which', 'will', 'with',
+    'within', 'you', 'your',
+    'answer', 'calculate', 'critical', 'e', 'example', 'examples', 'extract',
+    'found', 'format', 'g', 'identify', 'important', 'look', 'number', 'only',
+    'phrases', 'provide', 'respond', 'response', 'text',
+}
+
+# Query used when the caller only needs to know whether the page is an offer
+OFFER_DETECTION_QUERY = "bank account bonus promotion offer new checking savings open account earn cash bonus"
+
+# Query used for the fine print pass over the raw page
+CONSIDERATIONS_QUERY = (
+    "eligibility new customers existing customers not eligible disqualify exclusions "
+    "bonus forfeited clawback closed early fees penalty deadline terms conditions "
+    "direct deposit requirement limit one bonus per customer"
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into ranking terms."""
+    return [token.replace(',', '') for token in _TOKEN_PATTERN.findall(text.lower())
+            if token not in STOPWORDS]
+
+
+def split_passages(page_text: str, passage_words: int = CONTEXT_PASSAGE_WORDS) -> List[str]:
+    """Group sentences into passages of roughly passage_words words."""
+    passages = []
+    current = []
+    current_words = 0
+    for sentence in _SENTENCE_BOUNDARY.split(page_text):
+        words = sentence.split()
+        # Pages without punctuation (menus, tables) still get broken into windows
+        while len(words) > passage_words:
+            if current:
+                passages.append(" ".join(current))
+                current, current_words = [], 0
+            passages.append(" ".join(words[:passage_words]))
+            words = words[passage_words:]
+        if not words:
+            continue
+        if current_words + len(words) > passage_words and current:
+            passages.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(" ".join(words))
+        current_words += len(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class BM25:
+    """Okapi BM25 scorer over a fixed list of passages."""
+
+    def __init__(self, passages: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.term_counts)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """Return the BM25 score of every passage for the query."""
+        query_terms = set(tokenize(query))
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in query_terms:
+                freq = counts.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+
+def rank_passages(passages: Sequence[str], queries: Sequence[str]) -> List[float]:
+    """Combine per-query BM25 scores so every query gets a fair share of the budget."""
+    if not passages:
+        return []
+    index = BM25(passages)
+    combined = [0.0] * len(passages)
+    for query in queries:
+        query_scores = index.scores(query)
+        best = max(query_scores) if query_scores else 0.0
+        if best <= 0:
+            continue
+        # Normalize per query so long prompts don't drown out short ones
+        for i, score in enumerate(query_scores):
+            combined[i] += score / best
+    return combined
+
+
+def select_context(page_text: str, queries: Sequence[str], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                   max_chars: int = CONTEXT_SIZE) -> str:
+    """Build prompt context from the passages most relevant to the queries.
+
+    Pages that already fit the budget are returned unchanged. Otherwise the
+    best-ranked passages are kept, in their original page order, until the
+    token budget is full.
+    """
+    if not page_text:
+        return ""
+    if len(page_text) <= max_chars and count_tokens(page_text) <= token_budget:
+        return page_text
+
+    passages = split_passages(page_text)
+    scores = rank_passages(passages, queries)
+    if not any(scores):
+        # Nothing matched; fall back to the previous tail behaviour
+        return page_text[-max_chars:]
+
+    order = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    selected = []
+    used_tokens = 0
+    used_chars = 0
+    for i in order:
+        if scores[i] <= 0:
+            break
+        passage_tokens = count_tokens(passages[i])
+        if used_tokens + passage_tokens > token_budget or used_chars + len(passages[i]) > max_chars:
+            continue
+        selected.append(i)
+        used_tokens += passage_tokens
+        used_chars += len(passages[i]) + 1
+
+    selected.sort()
+    parts = []
+    previous = None
+    for i in selected:
+        # Mark gaps so the model doesn't read two distant passages as one sentence
+        if previous is not None and i != previous + 1:
+            parts.append("...")
+        parts.append(passages[i])
+        previous = i
+    return "\n".join(parts)
+
+
+def field_queries(param_names: Sequence[str] = None) -> List[str]:
+    """Return the extraction prompts used as ranking queries."""
+    return [task["prompt"] for task in FIELD_EXTRACTION_TASKS
+            if param_names is None or task["param_name"] in param_names]
+
+
+@lru_cache(maxsize=32)
+def offer_context(page_text: str) -> str:
+    """Context shared by every page-level prompt for an offer.
+
+    Ranked against all field prompts plus the detection and fine print
+    queries, and cached so every call for the same page sends a
+    byte-identical prefix that the provider can reuse. Ranking runs in the
+    CPU worker pool.
+    """
+    return run_cpu(_rank_offer_context, page_text)
+
+
+def _rank_offer_context(page_text: str) -> str:
+    return select_context(page_text, field_queries() + [OFFER_DETECTION_QUERY, CONSIDERATIONS_QUERY],
+                          max_chars=CONTEXT_SIZE)
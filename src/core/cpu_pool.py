@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+try:
+    from multiprocessing.popen_spawn_posix import Popen as _SpawnPopen
+except ImportError:
+    # Windows: workers re-run the main script as usual
+    _SpawnPopen = None
+
+from src.utils.config import (
+    CPU_POOL_WORKERS,
+    CPU_POOL_START_METHOD,
+    CPU_POOL_MIN_CHARS,
+    CPU_POOL_SHARED_MEMORY_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'pooled': 0, 'inline': 0, 'shared_memory_handoffs': 0, 'shared_memory_bytes': 0, 'pool_failures': 0}
+
+
+class _SharedPayload:
+    """Handle to page bytes placed in a shared memory block by the parent process."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+# Stands in for __main__ while a worker is launched; it has no file to re-run
+_BARE_MAIN = types.ModuleType('__main__')
+_launch_lock = threading.Lock()
+
+
+if _SpawnPopen is not None:
+    class _WorkerPopen(_SpawnPopen):
+        """Launches a spawn worker without re-running the parent's main script.
+
+        spawn normally runs the script that started the parent (app.py) again
+        in every worker as __mp_main__, with all its start-up work: AI client
+        setup, loading every offer, the Flask app. Workers only need the
+        modules their tasks live in, which they import when unpickling them.
+        """
+
+        def _launch(self, process_obj):
+            with _launch_lock:
+                main = sys.modules['__main__']
+                sys.modules['__main__'] = _BARE_MAIN
+                try:
+                    super()._launch(process_obj)
+                finally:
+                    sys.modules['__main__'] = main
+
+
+class _WorkerProcess(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+def _pool_context():
+    if CPU_POOL_START_METHOD == 'spawn' and _SpawnPopen is not None:
+        return _WorkerContext()
+    return multiprocessing.get_context(CPU_POOL_START_METHOD)
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _get_pool():
+    global _pool
+    if CPU_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=_pool_context())
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _decode(payload, encoding):
+    if isinstance(payload, str):
+        return payload
+    if isinstance(payload, _SharedPayload):
+        block = shared_memory.SharedMemory(name=payload.name)
+        try:
+            # Decode straight from the shared buffer without copying the bytes first
+            return str(block.buf[:payload.size], encoding, 'replace')
+        finally:
+            block.close()
+    return payload.decode(encoding, errors='replace')
+
+
+def _run_in_worker(fn, payload, encoding, args):
+    return fn(_decode(payload, encoding), *args)
+
+
+def run_cpu(fn, payload, *args, encoding='utf-8'):
+    """Run fn(text, *args) in the worker pool and wait for its result.
+
+    payload is the page text, or raw page bytes to be decoded with encoding
+    in the worker. Small payloads, or any payload when the pool is disabled
+    or has broken, run inline in the calling thread. fn must be a module-level
+    function so the workers can import it.
+    """
+    pool = _get_pool() if len(payload) >= CPU_POOL_MIN_CHARS else None
+    if pool is not None:
+        block = None
+        try:
+            handle = payload
+            if len(payload) >= CPU_POOL_SHARED_MEMORY_BYTES:
+                data = payload.encode('utf-8') if isinstance(payload, str) else payload
+                block = shared_memory.SharedMemory(create=True, size=len(data))
+                block.buf[:len(data)] = data
+                handle = _SharedPayload(block.name, len(data))
+                encoding = 'utf-8' if isinstance(payload, str) else encoding
+                _count('shared_memory_handoffs')
+                _count('shared_memory_bytes', len(data))
+            result = pool.submit(_run_in_worker, fn, handle, encoding, args).result()
+            _count('pooled')
+            return result
+        except BrokenProcessPool as exc:
+            logger.warning(f"CPU worker pool failed ({exc}); running {fn.__name__} inline")
+            _count('pool_failures')
+            _discard_pool(pool)
+        finally:
+            if block is not None:
+                block.close()
+                block.unlink()
+    _count('inline')
+    return _run_in_worker(fn, payload, encoding, args)
+
+
+def get_cpu_pool_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['workers'] = CPU_POOL_WORKERS
+    stats['started'] = _pool is not None
+    return stats
@@ -0,0 +1,289 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.data.data_manager import offers, save_offer
+from src.services import ai_clients
+from src.services.ai_clients import call_ai_samples, call_routed
+from src.services.provider_router import is_failed_response
+from src.services.usage_tracking import store_offer_usage
+from src.core.offer_processing import check_existing_accounts_with_same_bank
+from src.core.scraping import fetch_page_text
+from src.core.html_text import content_to_text
+from src.core.context_selection import offer_context
+from src.core.prompt_layout import shared_prefix_prompt
+from src.core.rule_extraction import NUMERIC_FIELDS, clean_numeric_result, normalize_answer
+from src.utils.config import FIELD_EXTRACTION_TASKS, REFRESH_BATCH_WORKERS
+
+
+def clear_refresh_status(offer_id, field_name):
+    """Helper function to clear refresh status for a field."""
+    if 'refresh_status' in offers[offer_id] and field_name in offers[offer_id]['refresh_status']:
+        del offers[offer_id]['refresh_status'][field_name]
+
+
+def _load_page_text(offer_id):
+    """Page text for a refresh: the stored content of a manual offer, or a fresh scrape."""
+    if 'original_content' in offers[offer_id]:
+        return content_to_text(offers[offer_id]['original_content'])
+    return fetch_page_text(offers[offer_id]['url'])
+
+
+def _refresh_field(offer_id, field_name, page_context):
+    """Re-queries one field against the already built offer context."""
+    try:
+        # Brief pause to ensure status is visible
+        time.sleep(0.3)
+        
+        # Get the prompt for the specific field
+        field_prompt = None
+        for task in FIELD_EXTRACTION_TASKS:
+            if task["param_name"] == field_name:
+                field_prompt = task["prompt"]
+                break
+        
+        if not field_prompt:
+            offers[offer_id]['details'][field_name] = 'N/A'
+            
+            # Clear refresh status before returning
+            clear_refresh_status(offer_id, field_name)
+            return
+        
+        # Check for existing accounts if this is the additional_considerations field
+        existing_accounts_context = ""
+        if field_name == "additional_considerations":
+            bank_name = offers[offer_id]['details'].get('bank_name', '')
+            existing_accounts = check_existing_accounts_with_same_bank(bank_name, offer_id)
+            
+            if existing_accounts:
+                existing_accounts_context = f"""
+IMPORTANT CONTEXT: The user has {len(existing_accounts)} existing opened account(s) with {bank_name}:
+{chr(10).join([f"- {account['account_title']} (ID: {account['id']})" for account in existing_accounts])}
+
+This information is crucial because many bank offers are restricted to "new customers only" or have specific eligibility requirements for existing customers. Pay special attention to any terms about:
+- New customer requirements
+- Existing customer restrictions
+- Eligibility for current account holders
+- Whether the offer applies to existing customers
+- Any special terms for current account holders
+"""
+        
+        # Send 3 queries to get different perspectives
+        query_prompt = shared_prefix_prompt("WEBSITE TEXT", page_context, f"""
+        Based on the website text above from a bank offer website, answer this specific question:
+        {field_prompt}
+        {existing_accounts_context}
+        
+        Provide only the answer, without any extra explanation.
+        """)
+        
+        # Use OpenAI as fallback when Gemini models are not available
+        if field_name == "additional_considerations":
+            model_to_use = ai_clients.openai_model_default
+            use_long_tokens = True
+        else:
+            # Try to use pro_model if available, otherwise fall back to OpenAI
+            model_to_use = ai_clients.pro_model if ai_clients.pro_model else ai_clients.openai_model_default
+            use_long_tokens = False
+        
+        # Sample 3 answers in a single multi-choice request instead of 3 separate calls
+        offers[offer_id]['refresh_status'][field_name] = 'querying'
+        start_query_time = time.time()
+        refresh_call_type = 'considerations' if use_long_tokens else 'refresh'
+        results = call_ai_samples(query_prompt, model_to_use, n=3, use_short_tokens=not use_long_tokens, temperature=0.5,
+                                  call_type=refresh_call_type, offer_id=offer_id, stage='refresh')
+        query_duration = time.time() - start_query_time
+        
+        # Determine if this field expects a numeric value
+        is_numeric_field = field_name in NUMERIC_FIELDS
+        
+        # Skip the consensus round trip when the samples that came back agree.
+        # A lone sample isn't agreement, and any error counts as disagreement
+        normalized_results = [normalize_answer(field_name, result) for result in results]
+        answers_agree = (len(results) >= 2 and not any(is_failed_response(result) for result in results)
+                         and len(set(normalized_results)) == 1)
+        # Share of the answered samples that gave the most common answer
+        answered = [normalized for result, normalized in zip(results, normalized_results)
+                    if not is_failed_response(result)]
+        agreement = max(answered.count(value) for value in answered) / len(answered) if answered else 0.0
+        
+        if answers_agree:
+            print(f"  All {len(results)} samples agree for '{field_name}', skipping consensus")
+            final_result = results[0]
+        else:
+            # The consensus prompt always lists three answers
+            results = (results + ["No answer"] * 3)[:3]
+
+            # Brief pause to ensure status is visible
+            time.sleep(0.3)
+        
+            # Send consensus query
+            offers[offer_id]['refresh_status'][field_name] = 'consensus'
+            start_consensus_time = time.time()
+        
+            if is_numeric_field:
+                # Special handling for minimum_daily_balance_required
+                    if field_name == 'minimum_daily_balance_required':
+                        consensus_prompt = shared_prefix_prompt("WEBSITE TEXT", page_context, f"""
+                        I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the website text above and the 3 AI responses:
+                    
+                        Question: {field_prompt}
+                        {existing_accounts_context}
+                    
+                        Answer 1: {results[0]}
+                        Answer 2: {results[1]}
+                        Answer 3: {results[2]}
+                    
+                        CRITICAL: This field is for minimum_daily_balance_required. You MUST extract ONLY a single dollar amount.
+                    
+                        RULES:
+                        1. If there are multiple balance requirements (e.g., checking vs savings), prioritize the CHECKING account requirement
+                        2. Extract ONLY the dollar amount, no text, no parentheses, no explanations
+                        3. Examples: "$1,500 (checking)" → "1500", "$300 savings" → "300", "1500" → "1500"
+                        4. If no clear balance requirement is found, respond with "0"
+                        5. Do NOT include multiple values or ranges
+                    
+                        Provide ONLY the numeric value for the checking account minimum daily balance requirement.
+                        """)
+                    else:
+                        consensus_prompt = shared_prefix_prompt("WEBSITE TEXT", page_context, f"""
+                        I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the website text above and the 3 AI responses:
+                    
+                        Question: {field_prompt}
+                        {existing_accounts_context}
+                    
+                        Answer 1: {results[0]}
+                        Answer 2: {results[1]}
+                        Answer 3: {results[2]}
+                    
+                        IMPORTANT: This field expects a NUMERIC value. Extract ONLY the relevant number from the most accurate answer.
+                    
+                        For minimum_deposit_amount: Extract only the dollar amount (e.g., "1000" from "$1,000")
+                        For bonus amounts: Extract only the dollar amount (e.g., "300" from "$300")
+                        For fees: Extract only the dollar amount (e.g., "0" from "$0" or "waived")
+                        For counts/days: Extract only the number (e.g., "90" from "90 days")
+                    
+                        If multiple values exist, choose the most relevant one based on the field context.
+                        Provide ONLY the numeric value, no text, no explanation.
+                        """)
+            else:
+                consensus_prompt = shared_prefix_prompt("WEBSITE TEXT", page_context, f"""
+                I have 3 different answers for the same question about a bank offer. Please determine the most accurate answer by considering both the website text above and the 3 AI responses:
+            
+                Question: {field_prompt}
+                {existing_accounts_context}
+            
+                Answer 1: {results[0]}
+                Answer 2: {results[1]}
+                Answer 3: {results[2]}
+            
+                Consider the context from the website text above and choose the most accurate answer. If the answers are similar, choose the most specific one. If they conflict significantly, choose the most reasonable answer based on the original content and typical bank offer patterns.
+            
+                Provide only the final answer, without explanation.
+                """)
+        
+            final_result = call_routed(consensus_prompt, refresh_call_type, use_short_tokens=not use_long_tokens,
+                                       offer_id=offer_id, stage='refresh')
+            consensus_duration = time.time() - start_consensus_time
+            print(f"  Consensus Response: '{final_result.strip()}'")
+        
+        # Post-process numeric fields to ensure clean numeric values
+        if is_numeric_field:
+            cleaned_result = clean_numeric_result(field_name, final_result)
+            print(f"  Cleaned numeric result: '{cleaned_result}'")
+            
+            offers[offer_id]['details'][field_name] = cleaned_result
+        else:
+            # Special handling for additional_considerations to ensure proper formatting
+            if field_name == 'additional_considerations':
+                result = final_result.strip()
+                # If the result doesn't contain newlines, try to split by consideration types
+                if '\n' not in result:
+                    consideration_regex = re.compile(r'(WARNING:|CAUTION:|GOOD:)')
+                    parts = consideration_regex.split(result)
+                    
+                    # Reconstruct with newlines
+                    reconstructed = ''
+                    for i, part in enumerate(parts):
+                        if re.match(r'^(WARNING:|CAUTION:|GOOD:)$', part):
+                            # This is a consideration type, add it to the reconstructed string
+                            if reconstructed and not reconstructed.endswith('\n'):
+                                reconstructed += '\n'
+                            reconstructed += part
+                        elif part.strip():
+                            # This is the content, add it after the type with a space
+                            reconstructed += ' ' + part.strip()
+                    
+                    result = reconstructed
+                
+                offers[offer_id]['details'][field_name] = result
+            else:
+                offers[offer_id]['details'][field_name] = final_result.strip()
+        
+        offers[offer_id].setdefault('field_confidence', {})[field_name] = {'source': 'llm_consensus', 'confidence': round(agreement, 2)}
+        store_offer_usage(offers[offer_id], offer_id)
+        
+        # Save the updated offer to storage
+        save_offer(offer_id)
+        
+        # Keep status visible for a moment before clearing
+        time.sleep(1.5)
+        
+        # Clear refresh status
+        clear_refresh_status(offer_id, field_name)
+        
+    except Exception as e:
+        print(f"❌ Error refreshing field {field_name} for offer {offer_id}: {e}")
+        offers[offer_id]['details'][field_name] = 'Refresh Failed'
+        store_offer_usage(offers[offer_id], offer_id)
+        # Save the failed offer to storage
+        save_offer(offer_id)
+        
+        # Clear refresh status on error
+        if 'refresh_status' in offers[offer_id] and field_name in offers[offer_id]['refresh_status']:
+            del offers[offer_id]['refresh_status'][field_name]
+
+
+def refresh_fields(offer_id, field_names):
+    """Rescrapes the page once and re-queries each of the given fields against it.
+
+    The page fetch and the shared offer context are done once for all the
+    fields, which are then queried in parallel, each reporting its own
+    refresh_status.
+    """
+    refresh_status = offers[offer_id].setdefault('refresh_status', {})
+    for field_name in field_names:
+        # Flag the refresh without changing the current value
+        refresh_status[field_name] = 'rescraping'
+
+    try:
+        page_text = _load_page_text(offer_id)
+    except Exception as e:
+        print(f"❌ Error rescraping offer {offer_id} to refresh {', '.join(field_names)}: {e}")
+        for field_name in field_names:
+            offers[offer_id]['details'][field_name] = 'Refresh Failed'
+            clear_refresh_status(offer_id, field_name)
+        store_offer_usage(offers[offer_id], offer_id)
+        # Save the failed offer to storage
+        save_offer(offer_id)
+        return
+
+    if not page_text:
+        print(f"❌ No content found for offer {offer_id}, setting {', '.join(field_names)} to N/A")
+        for field_name in field_names:
+            offers[offer_id]['details'][field_name] = 'N/A'
+            clear_refresh_status(offer_id, field_name)
+        return
+
+    # Same offer-wide context as the other page prompts so they share a cached prefix
+    page_context = offer_context(page_text)
+    if len(field_names) == 1:
+        _refresh_field(offer_id, field_names[0], page_context)
+        return
+    with ThreadPoolExecutor(max_workers=min(len(field_names), REFRESH_BATCH_WORKERS)) as executor:
+        list(executor.map(lambda field_name: _refresh_field(offer_id, field_name, page_context), field_names))
+
+
+def refresh_field_value(offer_id, field_name):
+    """Rescrapes and re-queries a specific field value."""
+    refresh_fields(offer_id, [field_name])
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from src.core.http_pool import host_key
+from src.utils.config import (
+    SCRAPE_GLOBAL_CONCURRENCY,
+    SCRAPE_PER_HOST_CONCURRENCY,
+    SCRAPE_HOST_REQUESTS_PER_SECOND,
+    SCRAPE_HOST_BURST,
+    SCRAPE_MAX_RETRY_AFTER,
+)
+
+
+def parse_retry_after(value, max_seconds=SCRAPE_MAX_RETRY_AFTER):
+    """Seconds to wait from a Retry-After header (delay-seconds or HTTP-date), or None if unusable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), max_seconds)
+
+
+class HostLimiter:
+    """Process-wide politeness scheduler for page fetches.
+
+    Caps concurrent fetches globally and per host, paces each host with a
+    token bucket, and keeps a backoff deadline per host. A 429 or Retry-After
+    seen by one fetch holds back every other fetch to that host, whether it
+    comes from a scrape, a field refresh or the re-crawl.
+
+    Waiting fetches are queued per host, and a free slot goes to the hosts in
+    round-robin order, so a burst of URLs for one bank can't starve another
+    bank's fetches. A host at its own limit, out of tokens or backing off is
+    skipped and the slot goes to the next host with fetches waiting.
+    """
+
+    def __init__(self, global_limit=SCRAPE_GLOBAL_CONCURRENCY, per_host_limit=SCRAPE_PER_HOST_CONCURRENCY,
+                 requests_per_second=SCRAPE_HOST_REQUESTS_PER_SECOND, burst=SCRAPE_HOST_BURST):
+        self.global_limit = global_limit
+        self.per_host_limit = per_host_limit
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._cond = threading.Condition()
+        self._active = defaultdict(int)
+        self._active_total = 0
+        self._waiting = {}
+        # Hosts with waiting fetches, in the order they get their next turn
+        self._turns = deque()
+        # host -> [tokens, monotonic time of last refill]
+        self._buckets = {}
+        # host -> monotonic time before which no fetch is sent
+        self._backoff_until = {}
+        self._counters = {'acquired': 0, 'queued': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                          'rate_limited_responses': 0, 'backoffs': 0, 'held_for_backoff': 0, 'held_for_rate': 0}
+
+    def _tokens(self, host, now):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = [float(self.burst), now]
+        bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.requests_per_second)
+        bucket[1] = now
+        return bucket[0]
+
+    def _seconds_until_ready(self, host, now):
+        """0 when the host can take a fetch now as far as pacing and backoff go."""
+        backoff = self._backoff_until.get(host, 0.0) - now
+        pacing = (1.0 - self._tokens(host, now)) / self.requests_per_second
+        return max(backoff, pacing, 0.0)
+
+    def _next_grant(self, now):
+        if self._active_total >= self.global_limit:
+            return None
+        for host in self._turns:
+            if self._active[host] < self.per_host_limit and not self._seconds_until_ready(host, now):
+                return host, self._waiting[host][0]
+        return None
+
+    def _wait_timeout(self, now):
+        """Time until a paced or backing-off host could be granted, or None to wait for a release."""
+        delays = [self._seconds_until_ready(host, now) for host in self._turns
+                  if self._active[host] < self.per_host_limit]
+        delays = [delay for delay in delays if delay > 0]
+        return min(delays) if delays else None
+
+    def acquire(self, url):
+        host = host_key(url)
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            if host not in self._waiting:
+                self._waiting[host] = deque()
+                self._turns.append(host)
+            self._waiting[host].append(ticket)
+            queued = self._next_grant(started) != (host, ticket)
+            if self._backoff_until.get(host, 0.0) > started:
+                # This fetch would have gone out inside the host's backoff window
+                self._counters['held_for_backoff'] += 1
+            elif self._tokens(host, started) < 1.0:
+                self._counters['held_for_rate'] += 1
+            while True:
+                now = time.monotonic()
+                if self._next_grant(now) == (host, ticket):
+                    break
+                self._cond.wait(self._wait_timeout(now))
+            self._waiting[host].popleft()
+            self._turns.remove(host)
+            if self._waiting[host]:
+                self._turns.append(host)
+            else:
+                del self._waiting[host]
+            self._buckets[host][0] -= 1.0
+            self._backoff_until.pop(host, None)
+            self._active[host] += 1
+            self._active_total += 1
+            waited = now - started
+            self._counters['acquired'] += 1
+            self._counters['queued'] += queued
+            self._counters['wait_seconds'] += waited
+            self._counters['max_wait_seconds'] = max(self._counters['max_wait_seconds'], waited)
+            # Other waiters may fit in the slots that are still free
+            self._cond.notify_all()
+        return host
+
+    def release(self, host):
+        with self._cond:
+            self._active[host] -= 1
+            if not self._active[host]:
+                del self._active[host]
+            self._active_total -= 1
+            self._cond.notify_all()
+
+    def backoff(self, url, seconds, rate_limited=True):
+        """Hold every fetch to the URL's host for the next `seconds`."""
+        host = host_key(url)
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self._backoff_until.get(host, 0.0):
+                self._backoff_until[host] = until
+            self._counters['backoffs'] += 1
+            self._counters['rate_limited_responses'] += rate_limited
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url):
+        host = self.acquire(url)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            stats = dict(self._counters)
+            stats['active'] = self._active_total
+            stats['waiting'] = sum(len(queue) for queue in self._waiting.values())
+            stats['active_by_host'] = dict(self._active)
+            stats['waiting_by_host'] = {host: len(queue) for host, queue in self._waiting.items()}
+            stats['backoff_seconds_by_host'] = {host: round(until - now, 1)
+                                                for host, until in self._backoff_until.items() if until > now}
+        stats['global_limit'] = self.global_limit
+        stats['per_host_limit'] = self.per_host_limit
+        stats['host_requests_per_second'] = self.requests_per_second
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 3)
+        return stats
+
+
+host_limiter = HostLimiter()
@@ -0,0 +1,312 @@
+import logging
+import re
+from html.parser import HTMLParser
+
+from src.core.cpu_pool import run_cpu
+from src.utils.config import (
+    HTML_MAX_BYTES,
+    HTML_STREAM_CHUNK_BYTES,
+    CONTENT_MAX_LINK_DENSITY,
+    CONTENT_SHORT_BLOCK_WORDS,
+    CONTENT_MIN_KEEP_RATIO,
+)
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Subtrees with no readable page content, dropped as they are parsed
+SKIPPED_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'svg'])
+# Elements that start a new text block
+BLOCK_TAGS = frozenset([
+    'html', 'body', 'main', 'article', 'section', 'div', 'p', 'ul', 'ol', 'li', 'dl', 'dt', 'dd',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'caption', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'nav', 'header', 'footer', 'aside', 'form', 'fieldset', 'blockquote', 'pre', 'address', 'figure',
+    'figcaption', 'details', 'summary', 'hr',
+])
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+# Table cells and list items, whose values legitimately repeat (tier tables)
+CELL_TAGS = frozenset(['td', 'th', 'li'])
+# Elements html.parser reports without an end tag
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source',
+                       'track', 'wbr'])
+# class or id values of containers that never hold offer terms
+_BOILERPLATE_HINT = re.compile(r"cookie|consent|gdpr|breadcrumb|skip-?(?:link|nav|to)", re.IGNORECASE)
+_DIGIT = re.compile(r"\d")
+_AMOUNT = re.compile(r"[\d$]")
+
+
+class TextBlock:
+    __slots__ = ('text', 'link_chars', 'heading', 'hinted', 'cell')
+
+    def __init__(self, text, link_chars, heading, hinted, cell=False):
+        self.text = text
+        self.link_chars = link_chars
+        self.heading = heading
+        self.hinted = hinted
+        self.cell = cell
+
+    @property
+    def link_density(self):
+        return self.link_chars / len(self.text) if self.text else 0.0
+
+
+class _TextCollector:
+    """Parser target that groups the stripped text nodes outside skipped subtrees into blocks.
+
+    Each block remembers how much of its text is link text, whether it is a
+    heading or a table cell or list item, and whether it sits in a cookie
+    banner or similar container.
+    Blocks inside <body> are returned when the document has one; otherwise
+    the blocks of the whole document are.
+    """
+
+    def __init__(self):
+        self.body_blocks = []
+        self.other_blocks = []
+        self._buffer = []
+        self._strings = []
+        self._link_chars = 0
+        self._heading = False
+        self._hinted = False
+        self._cell = False
+        # Open elements as (tag, {skip, link, heading, hinted, cell})
+        self._stack = []
+        self._depths = {'skip': 0, 'link': 0, 'heading': 0, 'hinted': 0, 'cell': 0}
+        self._in_body = False
+
+    def _flush(self):
+        if self._buffer:
+            text = "".join(self._buffer).strip()
+            self._buffer = []
+            if text:
+                self._strings.append(text)
+                if self._depths['link']:
+                    self._link_chars += len(text)
+                self._heading = self._heading or bool(self._depths['heading'])
+                self._hinted = self._hinted or bool(self._depths['hinted'])
+                self._cell = self._cell or bool(self._depths['cell'])
+
+    def _end_block(self):
+        self._flush()
+        if self._strings:
+            block = TextBlock(" ".join(self._strings), self._link_chars, self._heading, self._hinted, self._cell)
+            (self.body_blocks if self._in_body else self.other_blocks).append(block)
+        self._strings = []
+        self._link_chars = 0
+        self._heading = self._hinted = self._cell = False
+
+    def _push(self, tag, attrs):
+        hint = " ".join(str(value) for name, value in attrs if name in ('class', 'id', 'role') and value)
+        flags = {'skip': tag in SKIPPED_TAGS, 'link': tag == 'a', 'heading': tag in HEADING_TAGS,
+                 'hinted': bool(hint) and (bool(_BOILERPLATE_HINT.search(hint)) or 'navigation' in hint),
+                 'cell': tag in CELL_TAGS}
+        for name, on in flags.items():
+            self._depths[name] += on
+        self._stack.append((tag, flags))
+
+    def _pop_to(self, tag):
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for _, flags in self._stack[i:]:
+                    for name, on in flags.items():
+                        self._depths[name] -= on
+                del self._stack[i:]
+                return
+
+    def start(self, tag, attrs=None):
+        tag = tag.lower()
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        else:
+            self._flush()
+        if tag == 'body':
+            self._in_body = True
+        if tag not in VOID_TAGS:
+            attrs = attrs.items() if hasattr(attrs, 'items') else (attrs or ())
+            self._push(tag, attrs)
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in BLOCK_TAGS:
+            self._end_block()
+        else:
+            self._flush()
+        if tag == 'body':
+            self._in_body = False
+        self._pop_to(tag)
+
+    def data(self, text):
+        if not self._depths['skip']:
+            self._buffer.append(text)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._end_block()
+        return self.body_blocks or self.other_blocks
+
+
+class _StdlibTextParser(HTMLParser):
+    """html.parser front end for _TextCollector, used when lxml isn't installed."""
+
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags like <br/> or <svg/> have no content to skip
+        if tag.lower() in BLOCK_TAGS:
+            self.collector._end_block()
+        else:
+            self.collector._flush()
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+class HtmlTextExtractor:
+    """Incremental HTML-to-blocks conversion: feed() chunks as they arrive, then close().
+
+    Uses lxml's C parser when it is installed and html.parser otherwise. Both
+    drop script, style and other non-content subtrees while parsing, so no
+    document tree is built and memory stays proportional to the page text.
+    """
+
+    def __init__(self):
+        self._collector = _TextCollector()
+        if LXML_AVAILABLE:
+            self._parser = etree.HTMLParser(target=self._collector, recover=True, no_network=True)
+        else:
+            self._parser = _StdlibTextParser(self._collector)
+
+    def feed(self, text):
+        if text:
+            self._parser.feed(text)
+
+    def close(self):
+        """The page's text blocks, in document order."""
+        if LXML_AVAILABLE:
+            try:
+                return self._parser.close()
+            except etree.XMLSyntaxError:
+                # Nothing was fed, or the input wasn't HTML at all
+                return self._collector.close()
+        self._parser.close()
+        return self._collector.close()
+
+
+def reduce_blocks(blocks, max_link_density=CONTENT_MAX_LINK_DENSITY, short_block_words=CONTENT_SHORT_BLOCK_WORDS,
+                  min_keep_ratio=CONTENT_MIN_KEEP_RATIO):
+    """Drop boilerplate blocks and repeats. Returns (kept blocks, stats).
+
+    A block is boilerplate when most of its text is link text (menus, footer
+    link lists) and it has no digits or dollar signs, or when it sits in a
+    cookie banner or similar container. A short block without digits whose
+    neighbours are both boilerplate goes too, so menu captions and separators
+    leave with their menu. A paragraph of at least short_block_words words
+    that repeats an earlier one word for word is dropped wherever it is;
+    table cells, list items and shorter blocks are never deduplicated, since
+    tier tables repeat values. If boilerplate removal would leave less than
+    min_keep_ratio of the text, it is skipped and only the repeats are
+    dropped.
+    """
+    unique = []
+    seen = set()
+    for block in blocks:
+        words = block.text.split()
+        if block.cell or len(words) < short_block_words:
+            unique.append(block)
+            continue
+        key = " ".join(words).casefold()
+        if key not in seen:
+            seen.add(key)
+            unique.append(block)
+
+    boilerplate = [block.hinted or (not block.heading and not _AMOUNT.search(block.text)
+                                    and block.link_density > max_link_density) for block in unique]
+    for i, block in enumerate(unique):
+        if boilerplate[i] or block.heading or _DIGIT.search(block.text) or len(block.text.split()) >= short_block_words:
+            continue
+        before = boilerplate[i - 1] if i > 0 else True
+        after = boilerplate[i + 1] if i + 1 < len(unique) else True
+        if before and after and (i > 0 or i + 1 < len(unique)):
+            boilerplate[i] = True
+    kept = [block for block, drop in zip(unique, boilerplate) if not drop]
+
+    original_chars = len(" ".join(block.text for block in blocks))
+    if len(" ".join(block.text for block in kept)) < min_keep_ratio * original_chars:
+        kept = unique
+    kept_chars = len(" ".join(block.text for block in kept))
+    stats = {
+        'original_chars': original_chars,
+        'kept_chars': kept_chars,
+        'reduction_ratio': round(1 - kept_chars / original_chars, 4) if original_chars else 0.0,
+        'blocks': len(blocks),
+        'duplicate_blocks': len(blocks) - len(unique),
+        'boilerplate_blocks': len(unique) - len(kept),
+    }
+    return kept, stats
+
+
+def page_content(html):
+    """Main text of an HTML document with boilerplate and repeats removed.
+
+    Returns a dict with the space-joined 'text' and the reduction stats from
+    reduce_blocks.
+    """
+    extractor = HtmlTextExtractor()
+    extractor.feed(html)
+    kept, stats = reduce_blocks(extractor.close())
+    stats['text'] = " ".join(block.text for block in kept)
+    return stats
+
+
+def html_to_text(html, reduce=True):
+    """Readable text of an HTML document, as one space-joined string.
+
+    With reduce=False every text block is kept, boilerplate and repeats included.
+    """
+    if reduce:
+        return page_content(html)['text']
+    extractor = HtmlTextExtractor()
+    extractor.feed(html)
+    return " ".join(block.text for block in extractor.close())
+
+
+def content_to_text(content):
+    """Text of manually entered content, which may be HTML or already plain text."""
+    lowered = content.lower()
+    if '<html' in lowered or '<body' in lowered:
+        return run_cpu(html_to_text, content)
+    return content
+
+
+def _capped_chunks(response, max_bytes, chunk_size):
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if received + len(chunk) > max_bytes:
+                yield chunk[:max_bytes - received]
+                logger.warning(f"Page {response.url} is larger than {max_bytes} bytes; using the first {max_bytes}")
+                return
+            received += len(chunk)
+            yield chunk
+    finally:
+        response.close()
+
+
+def response_to_bytes(response, max_bytes=HTML_MAX_BYTES, chunk_size=HTML_STREAM_CHUNK_BYTES):
+    """Read at most max_bytes of a streamed response. Returns (body, encoding)."""
+    return b"".join(_capped_chunks(response, max_bytes, chunk_size)), response.encoding or 'utf-8'
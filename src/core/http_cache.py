@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from src.utils.config import HTTP_CACHE_DIR, HTTP_CACHE_FRESH_SECONDS, HTTP_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def text_digest(text):
+    """Digest of page text that ignores whitespace and case differences."""
+    return hashlib.sha256(" ".join(text.split()).casefold().encode('utf-8')).hexdigest()
+
+
+def page_sentences(text):
+    """The page text's sentences, normalized like text_digest."""
+    sentences = (" ".join(sentence.split()).casefold() for sentence in _SENTENCE_BREAK.split(text or ""))
+    return [sentence for sentence in sentences if sentence]
+
+
+def sentence_digests(text):
+    """Short digests of each sentence, for measuring how much of a page changed."""
+    return [hashlib.sha256(sentence.encode('utf-8')).hexdigest()[:12] for sentence in page_sentences(text)]
+
+
+class HttpCache:
+    """On-disk cache of fetched pages, one entry per URL.
+
+    Each entry keeps the page body (gzipped), its ETag and Last-Modified
+    validators, the parsed page text and a digest of that text. Entries
+    checked within fresh_seconds are used without any request; older ones are
+    revalidated with If-None-Match / If-Modified-Since so an unchanged page
+    costs a 304 instead of a download and a re-parse.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, fresh_seconds=HTTP_CACHE_FRESH_SECONDS,
+                 max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.fresh_seconds = fresh_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._counters = {'fresh_hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0}
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.json'), os.path.join(self.directory, key + '.html.gz')
+
+    def _write_entry(self, url, entry):
+        meta_path, _ = self._paths(url)
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, meta_path)
+
+    def count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get(self, url):
+        """The cached entry for a URL, or None."""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable HTTP cache entry for {url}: {e}")
+            return None
+
+    def is_fresh(self, entry):
+        return bool(entry) and time.time() - entry['checked_at'] < self.fresh_seconds
+
+    def conditional_headers(self, entry):
+        """Validator headers for revalidating a cached entry."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self, url):
+        """The cached raw page body, or None."""
+        _, body_path = self._paths(url)
+        try:
+            with gzip.open(body_path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def touch(self, url, entry):
+        """Mark an entry as just revalidated."""
+        entry['checked_at'] = time.time()
+        self._write_entry(url, entry)
+        self.count('revalidated')
+
+    def store(self, url, response_headers, body, encoding, text, reduction=None):
+        """Save a freshly downloaded page. Pages sent with Cache-Control: no-store are skipped."""
+        if 'no-store' in response_headers.get('Cache-Control', '').lower():
+            return None
+        now = time.time()
+        entry = {
+            'url': url,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'encoding': encoding,
+            'fetched_at': now,
+            'checked_at': now,
+            'text_digest': text_digest(text),
+            'text': text,
+            'reduction': reduction,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        _, body_path = self._paths(url)
+        tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+        # Body first, so an entry is never visible without its body
+        with gzip.open(tmp_path, 'wb', compresslevel=5) as f:
+            f.write(body)
+        os.replace(tmp_path, body_path)
+        self._write_entry(url, entry)
+        self.count('stores')
+        self._prune()
+        return entry
+
+    def _prune(self):
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+            if len(names) <= self.max_entries:
+                return
+            paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        except OSError:
+            return
+        for meta_path in paths[:len(paths) - self.max_entries]:
+            for path in (meta_path, meta_path[:-len('.json')] + '.html.gz'):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['fresh_hits'] + stats['revalidated'] + stats['misses']
+        # Lookups answered without downloading the page again
+        stats['hit_rate'] = round((stats['fresh_hits'] + stats['revalidated']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+http_cache = HttpCache()
@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+import logging
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.config import (
+    USER_AGENTS,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_POOL_IDLE_SECONDS,
+    HTTP_POOL_MAX_HOSTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def browser_headers(user_agent=None):
+    """Request headers that look like a regular browser visit."""
+    return {
+        'User-Agent': user_agent or random.choice(USER_AGENTS),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'DNT': '1',
+    }
+
+
+def host_key(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+class _PooledSession:
+    def __init__(self, session, user_agent):
+        self.session = session
+        self.user_agent = user_agent
+        self.last_used = time.monotonic()
+
+
+class SessionPool:
+    """One keep-alive requests.Session per host, shared by every fetch path.
+
+    Sessions idle longer than idle_seconds are closed, and the least recently
+    used host is dropped once max_hosts is reached. Each host keeps one
+    User-Agent for the life of its session, like a real browser would.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 idle_seconds=HTTP_POOL_IDLE_SECONDS, max_hosts=HTTP_POOL_MAX_HOSTS):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_seconds = idle_seconds
+        self.max_hosts = max_hosts
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'session_hits': 0, 'session_misses': 0, 'evictions': 0}
+        # Connection counts from sessions that have since been closed
+        self._closed_connections = 0
+        self._closed_requests = 0
+
+    def _new_session(self):
+        session = requests.Session()
+        # Retries are handled by the caller so 429s and backoff stay visible
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _close(self, pooled):
+        connections, requests_sent = self._connection_counts(pooled.session)
+        self._closed_connections += connections
+        self._closed_requests += requests_sent
+        pooled.session.close()
+
+    def _evict_idle(self, now):
+        for key in [key for key, pooled in self._sessions.items() if now - pooled.last_used > self.idle_seconds]:
+            self._close(self._sessions.pop(key))
+            self._counters['evictions'] += 1
+
+    def get(self, url):
+        """Return (session, headers) for the URL's host, creating the session on first use."""
+        key = host_key(url)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            pooled = self._sessions.get(key)
+            if pooled:
+                self._counters['session_hits'] += 1
+                self._sessions.move_to_end(key)
+            else:
+                self._counters['session_misses'] += 1
+                while len(self._sessions) >= self.max_hosts:
+                    _, oldest = self._sessions.popitem(last=False)
+                    self._close(oldest)
+                    self._counters['evictions'] += 1
+                pooled = _PooledSession(self._new_session(), random.choice(USER_AGENTS))
+                self._sessions[key] = pooled
+            pooled.last_used = now
+            return pooled.session, browser_headers(pooled.user_agent)
+
+    @staticmethod
+    def _connection_counts(session):
+        """Connections opened and requests sent through a session's urllib3 pools."""
+        connections = requests_sent = 0
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                if pool is not None:
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+        return connections, requests_sent
+
+    def stats(self):
+        """Session and connection reuse counters."""
+        with self._lock:
+            connections, requests_sent = self._closed_connections, self._closed_requests
+            for pooled in self._sessions.values():
+                opened, sent = self._connection_counts(pooled.session)
+                connections += opened
+                requests_sent += sent
+            stats = dict(self._counters)
+            stats['hosts'] = len(self._sessions)
+        lookups = stats['session_hits'] + stats['session_misses']
+        stats['session_hit_rate'] = round(stats['session_hits'] / lookups, 4) if lookups else 0.0
+        stats['connections_opened'] = connections
+        stats['requests'] = requests_sent
+        # Requests that went over an already open connection
+        stats['connection_reuse_rate'] = round(1 - connections / requests_sent, 4) if requests_sent else 0.0
+        return stats
+
+
+session_pool = SessionPool()
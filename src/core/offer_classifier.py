@@ -0,0 +1,76 @@
+import re
+from typing import Optional, Tuple
+
+from src.utils.config import OFFER_CLASSIFIER_MAX_REJECT_CHARS
+
+# Signals that only show up on pages with nothing to extract. Keyword scores
+# can't tell an offer page from its own navigation and footer ("Sign in",
+# "Credit cards", "Mortgage" appear on every bank page), so anything less
+# clear-cut than these goes to the LLM.
+# (name, pattern)
+_REJECT_SIGNALS = [
+    ('not_found', r"\b(?:page (?:not|cannot be) found|404 (?:error|not found)|this page (?:doesn't|does not) exist)\b"),
+    ('access_wall', r"\b(?:access denied|verify (?:you are|you're) (?:a )?human|captcha|are you a robot|request blocked)\b"),
+    ('maintenance', r"\b(?:scheduled maintenance|temporarily unavailable)\b"),
+    # A login form's field labels, each on a line of its own
+    ('login_form', r"^\s*(?:username|user id|password)\s*$"),
+]
+
+_COMPILED_SIGNALS = [(name, re.compile(pattern, re.IGNORECASE | re.MULTILINE)) for name, pattern in _REJECT_SIGNALS]
+
+# Any dollar amount means there may be an offer on the page after all
+_DOLLAR_AMOUNT = re.compile(r"\$\s?\d")
+
+# An offer page names a dollar bonus, opening a checking or savings account,
+# and a deposit to qualify. Pages that have all three but are about
+# something else are ruled out by _NOT_AN_OFFER.
+_BONUS_AMOUNT = re.compile(
+    r"\$\s?\d[\d,]*(?:\.\d{2})?\s+(?:(?:cash|new account|checking|savings)\s+)?bonus\b|\bbonus of \$\s?\d",
+    re.IGNORECASE)
+_ACCOUNT_OPENING = re.compile(r"\bopen(?:s|ing)?\b[^.]{0,80}?\b(?:checking|savings)\b[^.]{0,30}?\baccount\b",
+                              re.IGNORECASE)
+_DEPOSIT_REQUIREMENT = re.compile(r"\bdeposit", re.IGNORECASE)
+# Ended offers and articles that round up several banks' offers
+_NOT_AN_OFFER = re.compile(
+    r"\b(?:(?:offer|promotion) (?:has )?(?:ended|expired)|no longer available"
+    r"|posted on|share this article|related articles|comments \(\d+\))",
+    re.IGNORECASE)
+
+
+def reject_reason(page_text: str) -> Optional[str]:
+    """Why the page can't be an offer page, or None when the LLM has to decide."""
+    text = (page_text or "").strip()
+    if not text:
+        return 'empty_page'
+    if len(text) > OFFER_CLASSIFIER_MAX_REJECT_CHARS or _DOLLAR_AMOUNT.search(text):
+        return None
+    for name, pattern in _COMPILED_SIGNALS:
+        if pattern.search(text):
+            return name
+    return None
+
+
+def is_clear_offer(page_text: str) -> bool:
+    """True when the page plainly describes a deposit account bonus."""
+    text = page_text or ""
+    if not (_BONUS_AMOUNT.search(text) and _ACCOUNT_OPENING.search(text) and _DEPOSIT_REQUIREMENT.search(text)):
+        return False
+    if _NOT_AN_OFFER.search(text):
+        return False
+    return not any(pattern.search(text) for _, pattern in _COMPILED_SIGNALS)
+
+
+def classify_offer_page(page_text: str) -> Tuple[str, Optional[str]]:
+    """Return ('offer', 'bonus_terms'), ('not_offer', reason) or ('uncertain', None).
+
+    Only pages that name a dollar bonus for opening a checking or savings
+    account with a deposit are accepted, and only empty pages and short
+    error, captcha, maintenance or login pages are rejected. Everything
+    else goes to the LLM.
+    """
+    reason = reject_reason(page_text)
+    if reason:
+        return 'not_offer', reason
+    if is_clear_offer(page_text):
+        return 'offer', 'bonus_terms'
+    return 'uncertain', None
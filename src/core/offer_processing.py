@@ -2,12 +2,19 @@ import threading
 import time
 import sys
 import queue
+from functools import partial
 from urllib.parse import urlparse
 from src.utils.utils import normalize_url_for_comparison
 from src.data.data_manager import offers, save_offer
-from src.services.ai_clients import call_gemini, call_ai
+from src.services.ai_clients import call_routed
+from src.services.usage_tracking import usage_tracker, store_offer_usage
 from src.services import ai_clients
-from src.utils.config import FIELD_EXTRACTION_TASKS, CONTEXT_SIZE
+from src.utils.config import FIELD_EXTRACTION_TASKS, LIGHT_MODEL_FIELDS
+from src.core.context_selection import offer_context
+from src.core.prompt_layout import shared_prefix_prompt
+from src.core.rule_extraction import settled_fields, is_valid_answer
+from src.core.task_graph import TaskGraph
+from src.core.streaming import StreamingFieldWriter
 
 def check_existing_accounts_with_same_bank(bank_name, current_offer_id):
     """Check if user has any opened accounts with the same bank."""
@@ -54,8 +61,22 @@ def check_duplicate_offer(url):
 
 def extract_offer_details_with_ai(summary_content, raw_text, offer_id):
     """Sends parallel AI queries to extract offer details from a summary."""
+    # Settle easy numeric/date fields locally; only the rest go to the LLM
+    rule_results = settled_fields(raw_text)
+    llm_tasks = [task for task in FIELD_EXTRACTION_TASKS if task["param_name"] not in rule_results]
+    if offer_id in offers:
+        field_confidence = offers[offer_id].setdefault('field_confidence', {})
+        for param_name, rule_result in rule_results.items():
+            offers[offer_id]['details'][param_name] = rule_result['value']
+            field_confidence[param_name] = {'source': 'rules', 'confidence': rule_result['confidence']}
+        for task in llm_tasks:
+            field_confidence[task["param_name"]] = {'source': 'llm', 'confidence': None}
+        save_offer(offer_id)
+    if rule_results:
+        print(f"⚡ Rule-based extraction settled {len(rule_results)} field(s): {', '.join(rule_results)}")
+
     # Progress tracking
-    total_queries = len(FIELD_EXTRACTION_TASKS)
+    total_queries = len(llm_tasks)
     completed_queries = 0
     progress_lock = threading.Lock()
     
@@ -74,26 +95,33 @@ def extract_offer_details_with_ai(summary_content, raw_text, offer_id):
                     sys.stdout.write(f"\r{progress_text} ✅\n")
                     sys.stdout.flush()
     
+    def _record_field_model(param_name, tier):
+        if offer_id in offers:
+            offers[offer_id].setdefault('field_confidence', {}).setdefault(param_name, {})['model'] = tier
+
     def extract_detail(param_name, prompt):
         """Runs a single AI query in a thread using the flash model against the summary."""
-        full_prompt = f"""
-        Based on the summarized text below, answer the following question.
+        # The summary goes first so every field call for this offer shares a cacheable prefix
+        full_prompt = shared_prefix_prompt("SUMMARY TEXT", summary_content, f"""
+        Based on the summarized text above, answer the following question.
         Provide only the answer, without any extra explanation.
 
         Question: {prompt}
-
-        --- SUMMARY TEXT START ---
-        {summary_content}
-        --- SUMMARY TEXT END ---
-        """
-        # Try OpenAI first if available, otherwise fall back to Gemini
+        """)
         try:
-            if ai_clients.OPENAI_ENABLED:
-                result = call_ai(full_prompt, ai_clients.openai_model_default, use_short_tokens=True)
-            elif ai_clients.flash_model:
-                result = call_gemini(full_prompt, ai_clients.flash_model, use_short_tokens=True)
+            if param_name in LIGHT_MODEL_FIELDS:
+                result = call_routed(full_prompt, 'field_light', use_short_tokens=True, offer_id=offer_id,
+                                     stage='field', model=ai_clients.openai_model_light)
+                if not is_valid_answer(param_name, result):
+                    # The light model fumbled the format; ask the stronger model instead
+                    print(f"\n↗️ Escalating '{param_name}' to {ai_clients.openai_model_default} (light model answered '{result}')")
+                    result = call_routed(full_prompt, 'field', use_short_tokens=True, offer_id=offer_id)
+                    _record_field_model(param_name, 'escalated')
+                else:
+                    _record_field_model(param_name, 'light')
             else:
-                result = "AI Error: No models available"
+                result = call_routed(full_prompt, 'field', use_short_tokens=True, offer_id=offer_id)
+                _record_field_model(param_name, 'default')
         except Exception as e:
             print(f"⚠️ Error in AI extraction: {e}")
             result = "Processing..."
@@ -107,18 +135,49 @@ def extract_offer_details_with_ai(summary_content, raw_text, offer_id):
         update_progress(param_name, result)
 
     # Show initial progress
-    print(f"🚀 Tile load progress: 0/{total_queries} completed", end="")
+    print(f"🚀 Tile load progress: 0/{total_queries} completed", end="" if total_queries else " ✅\n")
     sys.stdout.flush()
 
-    threads = []
-    for task in FIELD_EXTRACTION_TASKS:
-        thread = threading.Thread(target=extract_detail, args=(task["param_name"], task["prompt"]))
-        threads.append(thread)
-        thread.start()
+    # Each node starts as soon as the fields it reads are ready, so tier
+    # validation and the fine print pass don't wait on unrelated fields
+    considerations_done = threading.Event()
+
+    def analyze_considerations():
+        try:
+            _analyze_considerations(summary_content, raw_text, offer_id)
+        finally:
+            considerations_done.set()
+
+    def show_fine_print_step():
+        # The fine print pass starts early, but it is only the visible step
+        # once every field has come back and it is still running
+        if offer_id in offers and not considerations_done.is_set():
+            offers[offer_id]['processing_step'] = "Analyzing Fine Print"
 
-    for thread in threads:
-        thread.join()
+    graph = TaskGraph()
+    for task in llm_tasks:
+        graph.add(task["param_name"], partial(extract_detail, task["param_name"], task["prompt"]))
+    graph.add('tier_validation', partial(_validate_bonus_tiers, offer_id), depends_on=['bonus_tiers_detailed', 'bonus_to_be_received'])
+    graph.add('additional_considerations', analyze_considerations, depends_on=['bank_name'])
+    graph.add('fine_print_step', show_fine_print_step, depends_on=[task["param_name"] for task in llm_tasks])
+    graph.run()
 
+    if offer_id in offers:
+        offers[offer_id]['processing_step'] = "Done"
+        
+        # Brief delay to ensure "Done" step is visible in UI before status change
+        time.sleep(1.0)
+        
+        offers[offer_id]['status'] = 'completed'
+        store_offer_usage(offers[offer_id], offer_id)
+        # Save the completed offer to storage
+        save_offer(offer_id)
+    else:
+        # The offer was deleted while it was being processed
+        usage_tracker.discard(offer_id)
+
+def _validate_bonus_tiers(offer_id):
+    """Checks the extracted tiers against the maximum bonus and fills in missing tiers."""
     # Validate and potentially update bonus tiers (optional - skip if AI not available)
     if offer_id in offers:
         extracted_data = offers[offer_id]['details']
@@ -160,12 +219,7 @@ def extract_offer_details_with_ai(summary_content, raw_text, offer_id):
                             
                             def run_validation():
                                 try:
-                                    if ai_clients.OPENAI_ENABLED:
-                                        validation_result = call_ai(validation_prompt, ai_clients.openai_model_default, use_short_tokens=True)
-                                    elif ai_clients.flash_model:
-                                        validation_result = call_gemini(validation_prompt, ai_clients.flash_model, use_short_tokens=True)
-                                    else:
-                                        validation_result = "AI Error: No models available"
+                                    validation_result = call_routed(validation_prompt, 'tier_validation', use_short_tokens=True, offer_id=offer_id)
                                     result_queue.put(('success', validation_result))
                                 except Exception as e:
                                     result_queue.put(('error', str(e)))
@@ -200,10 +254,10 @@ def extract_offer_details_with_ai(summary_content, raw_text, offer_id):
             except Exception as e:
                 print(f"⚠️ Error during bonus tier validation setup: {e}")
 
+def _analyze_considerations(summary_content, raw_text, offer_id):
+    """Looks through the raw page for fine print not covered by the summary."""
     if offer_id in offers:
-        offers[offer_id]['processing_step'] = "Analyzing Fine Print"
         extracted_data = offers[offer_id]['details']
-        context_summary = "\n".join([f"- {key.replace('_', ' ').title()}: {value}" for key, value in extracted_data.items() if value != 'Processing...'])
         
         # Check for existing accounts with the same bank
         bank_name = extracted_data.get('bank_name', '')
@@ -223,12 +277,12 @@ This information is crucial because many bank offers are restricted to "new cust
 - Any special terms for current account holders
 """
         
-        considerations_prompt = f"""
-        You have already extracted the following information about a bank offer:
-        {context_summary}
+        considerations_prompt = shared_prefix_prompt("WEBSITE TEXT", offer_context(raw_text), f"""
+        You have already extracted the following summary of a bank offer's key terms:
+        {summary_content}
         {existing_accounts_info}
 
-        Now, analyze the original raw website text below for CRUCIAL details that are NOT ALREADY MENTIONED in the information above. Focus ONLY on information DIRECTLY or INDIRECTLY related to:
+        Now, analyze the website text above for CRUCIAL details that are NOT ALREADY MENTIONED in the summary. Focus ONLY on information DIRECTLY or INDIRECTLY related to:
         - Claiming the bonus (requirements, processes, eligibility)
         - Anything that might PREVENT the user from claiming the bonus (disqualifications, exclusions, penalties)
         - Critical deadlines or time-sensitive requirements for bonus eligibility
@@ -243,20 +297,18 @@ This information is crucial because many bank offers are restricted to "new cust
 
         List UP TO 6 (can be less or even zero) of the most critical points as a newline-separated list. Each line MUST start with 'GOOD:', 'WARNING:', or 'CAUTION:'.
         GOOD is something beneficial to the user (relating to the bonus), CAUTION is something the user should be aware of, and WARNING is something that could prevent the user from claiming the bonus.
-        Limit GOOD considerations to 3 maximum. DO NOT repeat information already extracted above. Focus only on truly crucial, unique details that could make or break the bonus. 
+        Limit GOOD considerations to 3 maximum. DO NOT repeat information already in the summary. Focus only on truly crucial, unique details that could make or break the bonus. 
 
         IMPORTANT: Write clear statements that users can understand without additional context. Each sentence should be concise.
 
         If no such critical points are found, you MUST respond with 'N/A'. Do not use any kind of formatting or markdown.
-
-        --- RAW WEBSITE TEXT START ---
-        {raw_text[-CONTEXT_SIZE:]}
-        --- RAW WEBSITE TEXT END ---
-        """
+        """)
         
 
-        model_for_considerations = ai_clients.openai_model_default if ai_clients.OPENAI_ENABLED else ai_clients.flash_model
-        result = call_ai(considerations_prompt, model_for_considerations, use_short_tokens=False)
+        # Stream so considerations show up line by line instead of after the whole completion
+        writer = StreamingFieldWriter(offer_id, 'additional_considerations', line_buffered=True)
+        result = call_routed(considerations_prompt, 'considerations', use_short_tokens=False, on_partial=writer,
+                             offer_id=offer_id)
         
         # Ensure we have a meaningful response
         if not result or result.strip() == "" or result.strip().lower() in ["", "none", "nothing"]:
@@ -285,13 +337,4 @@ This information is crucial because many bank offers are restricted to "new cust
                 result = reconstructed
             
         offers[offer_id]['details']['additional_considerations'] = result
-
-    if offer_id in offers:
-        offers[offer_id]['processing_step'] = "Done"
-        
-        # Brief delay to ensure "Done" step is visible in UI before status change
-        time.sleep(1.0)
-        
-        offers[offer_id]['status'] = 'completed'
-        # Save the completed offer to storage
         save_offer(offer_id)
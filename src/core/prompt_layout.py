@@ -0,0 +1,16 @@
+import textwrap
+
+
+def shared_prefix_prompt(label, shared_content, instructions):
+    """Builds a prompt with the large shared content first and the per-call instructions last.
+
+    Providers cache prompt prefixes, so every call that sends the same content
+    under the same label starts with identical bytes and only the short tail
+    after it differs.
+    """
+    return (
+        f"--- {label} START ---\n"
+        f"{shared_content}\n"
+        f"--- {label} END ---\n\n"
+        f"{textwrap.dedent(instructions).strip()}\n"
+    )
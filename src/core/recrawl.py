@@ -0,0 +1,157 @@
+import copy
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+from src.data.data_manager import offers, save_offer
+from src.core.http_cache import text_digest, page_sentences, sentence_digests
+from src.core.scraping import fetch_page_text, process_manual_content, reset_offer_for_processing
+from src.utils.config import (
+    RECRAWL_INTERVAL_SECONDS,
+    RECRAWL_RATE_PER_MINUTE,
+    RECRAWL_MIN_CHANGE_RATIO,
+    RECRAWL_CHANGE_HISTORY,
+)
+
+logger = logging.getLogger(__name__)
+
+_MONEY = re.compile(r"[$%]")
+
+
+def is_tracked(offer):
+    """Completed offers scraped from a URL are re-crawled; manual content offers aren't."""
+    return (offer.get('status') == 'completed' and 'original_content' not in offer
+            and str(offer.get('url', '')).startswith(('http://', 'https://')))
+
+
+def measure_change(previous_digests, page_text):
+    """(share of sentences changed, whether any new sentence mentions an amount) since previous_digests."""
+    sentences = page_sentences(page_text)
+    digests = sentence_digests(page_text)
+    unmatched = Counter(previous_digests)
+    added = []
+    for sentence, digest in zip(sentences, digests):
+        if unmatched[digest]:
+            unmatched[digest] -= 1
+        else:
+            added.append(sentence)
+    removed = sum(unmatched.values())
+    total = max(len(previous_digests), len(digests), 1)
+    return max(len(added), removed) / total, any(_MONEY.search(sentence) for sentence in added)
+
+
+class RecrawlScheduler:
+    """Background thread that re-fetches tracked offer pages and re-extracts the ones that changed.
+
+    One page is checked every 60 / rate_per_minute seconds, longest unchecked
+    first, and an offer is due again interval_seconds after its last check.
+    Pages are compared by a digest of their normalized text, so only a real
+    content change pays for the LLM pipeline. Pages with dated or rotating
+    text change on every visit, so a change to fewer than
+    RECRAWL_MIN_CHANGE_RATIO of the sentences is ignored unless a new
+    sentence has a dollar amount or percentage in it. Each change entry keeps
+    the offer's details from before the re-extraction, including any values
+    the user corrected.
+    """
+
+    def __init__(self, interval_seconds=RECRAWL_INTERVAL_SECONDS, rate_per_minute=RECRAWL_RATE_PER_MINUTE):
+        self.interval_seconds = interval_seconds
+        self.period = 60.0 / rate_per_minute
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {'checked': 0, 'unchanged': 0, 'minor_changes': 0, 'changed': 0, 'baselined': 0,
+                          'errors': 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='recrawl', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def due_offers(self, now=None):
+        """Tracked offer ids due for a check, longest unchecked first."""
+        now = now or datetime.now()
+        due = []
+        for offer_id, offer in list(offers.items()):
+            if not is_tracked(offer):
+                continue
+            checked_at = offer.get('content_checked_at')
+            if checked_at and (now - datetime.fromisoformat(checked_at)).total_seconds() < self.interval_seconds:
+                continue
+            due.append((checked_at or '', offer_id))
+        return [offer_id for _, offer_id in sorted(due)]
+
+    def check_offer(self, offer_id):
+        """Re-fetch one offer's page. Returns True when it changed and was sent for re-extraction."""
+        offer = offers[offer_id]
+        now = datetime.now().isoformat(timespec='seconds')
+        try:
+            page_text = fetch_page_text(offer['url'])
+        finally:
+            # A failing page goes to the back of the queue instead of blocking it
+            offer['content_checked_at'] = now
+        self._count('checked')
+        digest = text_digest(page_text)
+        previous = offer.get('content_digest')
+        previous_sentences = offer.get('content_sentences')
+        offer['content_digest'] = digest
+        offer['content_sentences'] = sentence_digests(page_text)
+        if previous is None or previous == digest:
+            self._count('baselined' if previous is None else 'unchanged')
+            save_offer(offer_id)
+            return False
+        changed_ratio, mentions_amount = (measure_change(previous_sentences, page_text)
+                                          if previous_sentences is not None else (1.0, True))
+        if changed_ratio < RECRAWL_MIN_CHANGE_RATIO and not mentions_amount:
+            self._count('minor_changes')
+            save_offer(offer_id)
+            return False
+
+        print(f"🔄 Offer {offer_id} changed since its last check ({changed_ratio:.0%} of sentences); re-extracting")
+        changes = offer.setdefault('content_changes', [])
+        changes.append({'detected_at': now, 'previous_digest': previous, 'digest': digest,
+                        'changed_ratio': round(changed_ratio, 3),
+                        'previous_details': copy.deepcopy(offer.get('details', {}))})
+        del changes[:-RECRAWL_CHANGE_HISTORY]
+        offer['content_changed_at'] = now
+        self._count('changed')
+        reset_offer_for_processing(offer_id)
+        process_manual_content(page_text, offer_id)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            due = self.due_offers()
+            if not due:
+                continue
+            try:
+                self.check_offer(due[0])
+            except Exception as e:
+                self._count('errors')
+                logger.warning(f"Re-crawl of offer {due[0]} failed: {e}")
+                if due[0] in offers:
+                    save_offer(due[0])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        stats['tracked'] = sum(1 for offer in list(offers.values()) if is_tracked(offer))
+        stats['due'] = len(self.due_offers())
+        stats['interval_seconds'] = self.interval_seconds
+        stats['seconds_between_checks'] = self.period
+        return stats
+
+
+recrawl_scheduler = RecrawlScheduler()
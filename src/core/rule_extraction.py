@@ -0,0 +1,256 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.core.cpu_pool import run_cpu
+from src.utils.config import RULE_CONFIDENCE_THRESHOLD
+
+# Fields that hold a single number once cleaned up
+NUMERIC_FIELDS = [
+    'minimum_daily_balance_required', 'minimum_deposit_amount', 'initial_deposit_amount',
+    'bonus_to_be_received', 'minimum_monthly_fee', 'num_required_deposits',
+    'days_for_deposit', 'days_for_bonus', 'must_be_open_for', 'total_deposit_required'
+]
+
+# Fields answered with a plain yes or no
+YES_NO_FIELDS = ['fee_is_conditional', 'clawback_clause_present']
+
+# Longest plausible answer for short free-text fields
+_SHORT_TEXT_LIMITS = {'bank_name': 60, 'account_title': 80}
+
+_WORD_NUMBERS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+}
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+_AMOUNT = r"\$\s?([\d,]+(?:\.\d{2})?)"
+_COUNT = r"(\d+|" + "|".join(_WORD_NUMBERS) + r")"
+_UNIT = r"(calendar days|business days|days|months)"
+_DATE = (
+    r"((?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}"
+    r"|\d{1,2}/\d{1,2}/\d{4}"
+    r"|\d{4}-\d{2}-\d{2})"
+)
+
+# High-confidence phrasings only. Anything vaguer is left to the LLM.
+FIELD_PATTERNS = {
+    'minimum_deposit_amount': [
+        r"(?:qualifying (?:direct )?|direct |new money )deposits?\s+(?:totaling|totalling|of at least|of)\s+(?:at least\s+)?" + _AMOUNT,
+        r"minimum (?:qualifying |direct )deposit (?:of|amount of)\s+" + _AMOUNT,
+    ],
+    'days_for_deposit': [
+        r"deposits?[^.]{0,80}?within\s+" + _COUNT + r"\s+" + _UNIT + r"\s+(?:of|after|from)\s+(?:the\s+)?(?:account\s+)?(?:opening|open|enrollment)",
+    ],
+    'must_be_open_for': [
+        # Anchored to the account so opening hours ("branches will be open 7 days a week") don't match
+        r"(?:account (?:must |should |needs to )?(?:remain|stay|be kept|be)|(?:keep|kept) (?:the|your) account) open "
+        r"(?:for\s+)?(?:at least\s+|a minimum of\s+)?" + _COUNT + r"\s+" + _UNIT,
+        r"(?:is|are|gets?) closed (?:by you )?within\s+" + _COUNT + r"\s+" + _UNIT + r"\s+(?:of|after|from)\s+(?:account\s+)?open",
+    ],
+    'deal_expiration_date': [
+        r"(?:offer|promotion|bonus)\s+(?:ends|expires|is valid through|valid through|is available through|available through|ends on|expires on)\s+" + _DATE,
+        r"(?:open|opened)\s+(?:an?|your|a new)?\s*(?:new\s+)?(?:\w+\s+){0,2}account\s+by\s+" + _DATE,
+    ],
+}
+
+_COMPILED_PATTERNS = {
+    field: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for field, patterns in FIELD_PATTERNS.items()
+}
+
+
+def _to_int(count: str) -> Optional[int]:
+    count = count.lower()
+    if count.isdigit():
+        return int(count)
+    return _WORD_NUMBERS.get(count)
+
+
+def _to_days(count: str, unit: str) -> Optional[int]:
+    value = _to_int(count)
+    if value is None:
+        return None
+    return value * 30 if unit.lower() == 'months' else value
+
+
+def _to_amount(amount: str) -> str:
+    value = float(amount.replace(',', ''))
+    return str(int(value)) if value.is_integer() else f"{value:.2f}"
+
+
+def _to_iso_date(date_str: str) -> Optional[str]:
+    date_str = date_str.strip()
+    if re.match(r"\d{4}-\d{2}-\d{2}$", date_str):
+        formats = ['%Y-%m-%d']
+    elif '/' in date_str:
+        formats = ['%m/%d/%Y']
+    else:
+        parts = re.match(r"([a-z]+)\.?\s+(\d{1,2}),?\s+(\d{4})", date_str, re.IGNORECASE)
+        if not parts:
+            return None
+        month = _MONTHS.get(parts.group(1).lower()[:4]) or _MONTHS.get(parts.group(1).lower()[:3])
+        if not month:
+            return None
+        date_str = f"{parts.group(3)}-{month:02d}-{int(parts.group(2)):02d}"
+        formats = ['%Y-%m-%d']
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def _normalize_match(field_name: str, match: re.Match) -> Optional[str]:
+    if field_name == 'minimum_deposit_amount':
+        return _to_amount(match.group(1))
+    if field_name in ('days_for_deposit', 'must_be_open_for'):
+        days = _to_days(match.group(1), match.group(2))
+        return str(days) if days else None
+    if field_name == 'deal_expiration_date':
+        return _to_iso_date(match.group(1))
+    return None
+
+
+def extract_field(field_name: str, page_text: str) -> Optional[Dict]:
+    """Try the field's patterns against the page and score the agreement."""
+    values: List[str] = []
+    evidence = None
+    for pattern in _COMPILED_PATTERNS.get(field_name, []):
+        for match in pattern.finditer(page_text):
+            value = _normalize_match(field_name, match)
+            if value is None:
+                continue
+            values.append(value)
+            if evidence is None:
+                evidence = match.group(0)
+    if not values:
+        return None
+
+    distinct = set(values)
+    if len(distinct) == 1:
+        # One unambiguous value; repeated mentions make it more certain
+        confidence = 0.95 if len(values) > 1 else 0.9
+        value = values[0]
+    else:
+        # Several values usually means tiers or different products on the page
+        value = max(distinct, key=values.count)
+        confidence = round(0.6 * values.count(value) / len(values), 2)
+    return {'value': value, 'confidence': confidence, 'source': 'rules', 'evidence': evidence}
+
+
+def pre_extract_fields(page_text: str) -> Dict[str, Dict]:
+    """Run the rule-based extractor over every supported field."""
+    results = {}
+    for field_name in FIELD_PATTERNS:
+        result = extract_field(field_name, page_text)
+        if result:
+            results[field_name] = result
+    return results
+
+
+def settled_fields(page_text: str, threshold: float = RULE_CONFIDENCE_THRESHOLD) -> Dict[str, Dict]:
+    """Return only the pre-extracted fields confident enough to skip the LLM.
+
+    The patterns run in the CPU worker pool.
+    """
+    return run_cpu(_settled_fields, page_text, threshold)
+
+
+def _settled_fields(page_text: str, threshold: float) -> Dict[str, Dict]:
+    return {field: result for field, result in pre_extract_fields(page_text).items()
+            if result['confidence'] >= threshold}
+
+
+def clean_numeric_result(field_name: str, result: str) -> str:
+    """Reduce an LLM answer for a numeric field to just the number."""
+    cleaned_result = result.strip()
+    # Remove common non-numeric text and extract just the number
+    if field_name == 'minimum_daily_balance_required':
+        # Extract the first dollar amount found - prioritize checking account requirements
+        if 'checking' in cleaned_result.lower():
+            # Look for checking account balance requirement first
+            checking_match = re.search(r'checking.*?\$?([0-9,]+)', cleaned_result, re.IGNORECASE)
+            if checking_match:
+                cleaned_result = checking_match.group(1).replace(',', '')
+            else:
+                # Fall back to any dollar amount
+                dollar_match = re.search(r'\$?([0-9,]+)', cleaned_result)
+                if dollar_match:
+                    cleaned_result = dollar_match.group(1).replace(',', '')
+        else:
+            # Extract any dollar amount found
+            dollar_match = re.search(r'\$?([0-9,]+)', cleaned_result)
+            if dollar_match:
+                cleaned_result = dollar_match.group(1).replace(',', '')
+
+        if cleaned_result == result.strip():  # No change made
+            if '0' in cleaned_result.lower() or 'none' in cleaned_result.lower():
+                cleaned_result = '0'
+            elif 'n/a' in cleaned_result.lower():
+                cleaned_result = 'N/A'
+
+        # Ensure we have a valid numeric result
+        if not cleaned_result.isdigit() and cleaned_result != '0' and cleaned_result != 'N/A':
+            final_extraction = re.search(r'([0-9]+)', cleaned_result)
+            cleaned_result = final_extraction.group(1) if final_extraction else '0'
+
+    elif field_name in ['days_for_deposit', 'days_for_bonus', 'must_be_open_for', 'num_required_deposits']:
+        # Extract just the number
+        number_match = re.search(r'([0-9]+)', cleaned_result)
+        if number_match:
+            cleaned_result = number_match.group(1)
+        elif 'n/a' in cleaned_result.lower():
+            cleaned_result = 'N/A'
+
+    elif field_name in ['minimum_monthly_fee', 'minimum_deposit_amount', 'initial_deposit_amount', 'bonus_to_be_received', 'total_deposit_required']:
+        # Extract dollar amount
+        dollar_match = re.search(r'\$?([0-9,]+\.?[0-9]*)', cleaned_result)
+        if dollar_match:
+            cleaned_result = dollar_match.group(1).replace(',', '')
+        elif '0' in cleaned_result.lower() or 'none' in cleaned_result.lower() or 'waived' in cleaned_result.lower():
+            cleaned_result = '0'
+
+    return cleaned_result
+
+
+def normalize_answer(field_name: str, answer: str) -> str:
+    """Normalize an answer so equivalent samples compare equal."""
+    if field_name in NUMERIC_FIELDS:
+        normalized = clean_numeric_result(field_name, answer)
+    else:
+        normalized = answer.strip()
+    normalized = re.sub(r"\s+", " ", normalized.lower()).strip(" .,;:!\"'")
+    if field_name in NUMERIC_FIELDS:
+        try:
+            normalized = f"{float(normalized.replace(',', '')):g}"
+        except ValueError:
+            pass
+    return normalized
+
+
+def is_valid_answer(field_name: str, answer: str) -> bool:
+    """Check that an LLM answer has the shape the field's prompt asks for.
+
+    Used to decide whether a light-model answer can be kept or the field
+    should be asked again of a stronger model.
+    """
+    if not answer or answer.startswith("AI Error") or answer == "AI Model Not Configured":
+        return False
+    text = answer.strip().strip('.')
+    if text.upper() == 'N/A':
+        return field_name not in YES_NO_FIELDS
+    if field_name in YES_NO_FIELDS:
+        return re.fullmatch(r"(yes|no)", text, re.IGNORECASE) is not None
+    if field_name == 'deal_expiration_date':
+        return re.fullmatch(r"\d{4}-\d{2}-\d{2}", text) is not None and _to_iso_date(text) == text
+    if field_name in NUMERIC_FIELDS:
+        return re.fullmatch(r"\$?\s?\d[\d,]*(?:\.\d+)?", text) is not None
+    if field_name in _SHORT_TEXT_LIMITS:
+        return '\n' not in text and len(text) <= _SHORT_TEXT_LIMITS[field_name]
+    return True
@@ -2,35 +2,65 @@ import requests
 import random
 import time
 import logging
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
 from src.data.data_manager import offers, save_offer
-from src.services.ai_clients import is_banking_offer_page, call_gemini, pro_model
+from src.services.ai_clients import is_banking_offer_page, call_routed
+from src.services.usage_tracking import usage_tracker, store_offer_usage
 from src.core.offer_processing import extract_offer_details_with_ai
-from src.utils.config import USER_AGENTS, CONTEXT_SIZE
+from src.core.context_selection import offer_context
+from src.core.prompt_layout import shared_prefix_prompt
+from src.core.http_pool import session_pool
+from src.core.host_limiter import host_limiter, parse_retry_after
+from src.core.html_text import content_to_text, page_content, response_to_bytes
+from src.core.cpu_pool import run_cpu
+from src.core.http_cache import http_cache, text_digest, sentence_digests
+from src.services import replay
+from src.utils.config import (
+    FIELD_EXTRACTION_TASKS,
+    SPECULATIVE_SUMMARY,
+    SPECULATIVE_SUMMARY_HEAD_START,
+    SCRAPE_CONNECT_TIMEOUT,
+    SCRAPE_READ_TIMEOUT,
+)
 
-logger = None
+logger = logging.getLogger(__name__)
 
-_SCRAPE_SEMAPHORE = None
+def _http_get_with_retry(session, url, headers, timeout=15, max_retries=3, backoff_base=0.8, read_body=None):
+    """GET with retries. When read_body is given the body is streamed into it and its result is returned.
 
-def _get_scrape_semaphore():
-    global _SCRAPE_SEMAPHORE
-    if _SCRAPE_SEMAPHORE is None:
-        import threading
-        # Limit concurrent scrapes to reduce rate limiting
-        _SCRAPE_SEMAPHORE = threading.Semaphore(4)
-    return _SCRAPE_SEMAPHORE
+    A 429, or a 503 with Retry-After, backs off the whole host through
+    host_limiter, so concurrent fetches to it wait too instead of each
+    running into the limit.
 
-def _http_get_with_retry(session, url, headers, timeout=15, max_retries=3, backoff_base=0.8):
+    In replay mode the recorded response is returned without a request; in
+    record mode every final response or error is saved to the archive.
+    """
+    archive = replay.archive
+    if archive is not None and not archive.recording:
+        resp = archive.replay_response(url)
+        resp.raise_for_status()
+        return read_body(resp) if read_body is not None else resp
     last_exc = None
     for attempt in range(1, max_retries + 1):
         try:
-            resp = session.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-            # Explicit 429 handling
-            if resp.status_code == 429:
-                retry_after = resp.headers.get('Retry-After')
-                sleep_s = float(retry_after) if retry_after and retry_after.isdigit() else backoff_base * (2 ** (attempt - 1)) + random.random()
-                logger.warning(f"HTTP 429 received for {url}. Backing off {sleep_s:.2f}s (attempt {attempt}/{max_retries})")
-                time.sleep(sleep_s)
+            # Hold a fetch slot only for the request itself, not the backoff waits
+            with host_limiter.slot(url):
+                resp = session.get(url, headers=headers, timeout=timeout, allow_redirects=True,
+                                   stream=read_body is not None)
+                retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+                throttled = resp.status_code == 429 or (resp.status_code == 503 and retry_after is not None)
+                if archive is not None and not throttled:
+                    archive.record_response(url, resp)
+                if read_body is not None and not throttled:
+                    resp.raise_for_status()
+                    return read_body(resp)
+            if throttled:
+                resp.close()
+                backoff_s = retry_after if retry_after is not None else backoff_base * (2 ** (attempt - 1)) + random.random()
+                logger.warning(f"HTTP {resp.status_code} received for {url}. Backing off the host for {backoff_s:.2f}s (attempt {attempt}/{max_retries})")
+                host_limiter.backoff(url, backoff_s, rate_limited=resp.status_code == 429)
+                last_exc = requests.HTTPError(f"{resp.status_code} after {max_retries} attempts for {url}", response=resp)
                 continue
             resp.raise_for_status()
             return resp
@@ -40,59 +70,72 @@ def _http_get_with_retry(session, url, headers, timeout=15, max_retries=3, backo
             logger.warning(f"Request error for {url}: {exc}. Retry in {sleep_s:.2f}s (attempt {attempt}/{max_retries})")
             time.sleep(sleep_s)
     if last_exc:
+        if archive is not None:
+            archive.record_error(url, last_exc)
         raise last_exc
 
-def scrape_and_process_url(url, offer_id):
-    """Scrapes, summarizes, and triggers the AI extraction process."""
-    try:
-        offers[offer_id]['processing_step'] = "Scraping Website"
-        
-        print(f"Scraping URL: {url}")
-        session = requests.Session()
-        headers = {
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'DNT': '1',
-        }
-        # Limit concurrency and add retry/backoff
-        with _get_scrape_semaphore():
-            response = _http_get_with_retry(session, url, headers, timeout=15, max_retries=4, backoff_base=1.0)
+def fetch_url(url, timeout=(SCRAPE_CONNECT_TIMEOUT, SCRAPE_READ_TIMEOUT), max_retries=4, backoff_base=1.0,
+              read_body=None, extra_headers=None):
+    """Fetches a page over the host's pooled keep-alive session, within the global and per-host limits, with retries."""
+    session, headers = session_pool.get(url)
+    if extra_headers:
+        headers = {**headers, **extra_headers}
+    return _http_get_with_retry(session, url, headers, timeout=timeout, max_retries=max_retries,
+                                backoff_base=backoff_base, read_body=read_body)
 
-        offers[offer_id]['processing_step'] = "Validating Offer"
+def _read_page(response):
+    if response.status_code == 304:
+        response.close()
+        return None
+    body, encoding = response_to_bytes(response)
+    return body, encoding, response.headers
 
-        print("Scraping successful. Parsing content...")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        body_content = soup.body
-        if body_content:
-            for script_or_style in body_content(["script", "style"]):
-                script_or_style.decompose()
-            page_text = " ".join(body_content.stripped_strings)
-        else:
-            page_text = ""
+def fetch_page(url):
+    """Fetches a page's main text, going through the HTTP cache. Returns (text, reduction stats).
 
-        if not page_text:
-            raise ValueError("Could not find any text content in the page body.")
+    A page checked within the freshness window is returned without a request.
+    Otherwise the cached copy is revalidated, and a 304 reuses its parsed text.
+    The cache is skipped while recording or replaying, so every page goes
+    through the archive.
+    """
+    cached = http_cache.get(url) if replay.archive is None else None
+    if http_cache.is_fresh(cached):
+        http_cache.count('fresh_hits')
+        return cached['text'], cached.get('reduction')
+    page = fetch_url(url, read_body=_read_page, extra_headers=http_cache.conditional_headers(cached))
+    if page is None:
+        if cached is None:
+            raise requests.HTTPError(f"304 Not Modified for {url} with no cached copy")
+        http_cache.touch(url, cached)
+        return cached['text'], cached.get('reduction')
+    http_cache.count('misses')
+    body, encoding, headers = page
+    reduction = run_cpu(page_content, body, encoding=encoding)
+    text = reduction.pop('text')
+    print(f"Reduced page text from {reduction['original_chars']} to {reduction['kept_chars']} chars "
+          f"({reduction['reduction_ratio']:.0%}; {reduction['boilerplate_blocks']} boilerplate and "
+          f"{reduction['duplicate_blocks']} repeated blocks)")
+    if replay.archive is None:
+        http_cache.store(url, headers, body, encoding, text, reduction)
+    return text, reduction
 
-        print("Checking if it's a banking offer page.")
-        # Add a small delay to make the validation step visible
-        time.sleep(0.5)
-        if not is_banking_offer_page(page_text):
-            print("AI check failed: Not a banking offer page.")
-            offers[offer_id]['status'] = 'failed'
-            offers[offer_id]['processing_step'] = "Validation Failed"
-            offers[offer_id]['details']['bank_name'] = 'AI Check Failed: Not an offer page.'
-            # Save the failed offer to storage
-            save_offer(offer_id)
-            return
+def fetch_page_text(url):
+    """Fetches a page and returns its main text."""
+    return fetch_page(url)[0]
 
-        offers[offer_id]['processing_step'] = "Condensing Terms"
-        print("Validation check passed. Creating a summary of the offer terms.")
-        summary_prompt = f"""
-        Condense the following bank offer text into a verbose bulleted list of all key terms, conditions, numbers, and dates. 
+def reset_offer_for_processing(offer_id):
+    """Puts an offer back into the processing state before its pipeline runs again."""
+    offer = offers[offer_id]
+    offer['status'] = 'processing'
+    offer['processing_step'] = 'Validating Content' if 'original_content' in offer else 'Scraping Website'
+    offer['details'] = {field['param_name']: 'Processing...' for field in FIELD_EXTRACTION_TASKS + [{"param_name": "additional_considerations"}]}
+    offer.pop('refresh_status', None)
+    offer.pop('field_confidence', None)
+    save_offer(offer_id)
+
+def _build_summary_prompt(page_text):
+    return shared_prefix_prompt("WEBSITE TEXT", offer_context(page_text), """
+        Condense the bank offer text above into a verbose bulleted list of all key terms, conditions, numbers, and dates. 
 
         IMPORTANT: Prioritize and include information relevant to these specific fields that will be extracted:
         - Bank name and account title (keep concise, avoid lengthy descriptions)
@@ -109,20 +152,90 @@ def scrape_and_process_url(url, offer_id):
 
         If there are multiple bonus tiers with different deposit requirements, clearly identify each tier and its requirements.
         Focus on the most important points that directly affect getting the bonus, avoiding fees, or meeting deadlines. Prioritize critical information over minor details.
+        """)
 
-        --- RAW TEXT START ---
-        {page_text[-CONTEXT_SIZE:]}
-        --- RAW TEXT END ---
-        """
-        # Try OpenAI first if available, otherwise fall back to Gemini
-        from src.services.ai_clients import call_ai, openai_model_default, OPENAI_ENABLED
-        if OPENAI_ENABLED:
-            summary_content = call_ai(summary_prompt, openai_model_default, use_short_tokens=False)
-        elif pro_model:
-            summary_content = call_gemini(summary_prompt, pro_model, use_short_tokens=False)
-        else:
-            summary_content = "AI Error: No models available"
-        # Summary created successfully (content not logged to console)
+def _summarize(page_text, offer_id):
+    summary_prompt = _build_summary_prompt(page_text)
+    return call_routed(summary_prompt, 'summary', use_short_tokens=False, offer_id=offer_id)
+
+def _mark_validation_failed(offer_id):
+    print("AI check failed: Not a banking offer page.")
+    offers[offer_id]['status'] = 'failed'
+    offers[offer_id]['processing_step'] = "Validation Failed"
+    offers[offer_id]['details']['bank_name'] = 'AI Check Failed: Not an offer page.'
+    store_offer_usage(offers[offer_id], offer_id)
+    # Save the failed offer to storage
+    save_offer(offer_id)
+
+def _store_late_usage(offer_id):
+    """Folds usage recorded after an offer was finished into its stored record."""
+    if offer_id not in offers:
+        usage_tracker.discard(offer_id)
+        return
+    store_offer_usage(offers[offer_id], offer_id)
+    save_offer(offer_id)
+
+def _validate_and_summarize(page_text, offer_id):
+    """Validates the page and summarizes it. Returns None if the page is not an offer."""
+    print("Checking if it's a banking offer page.")
+    if not SPECULATIVE_SUMMARY:
+        # Add a small delay to make the validation step visible
+        time.sleep(0.5)
+        if not is_banking_offer_page(page_text, offer_id):
+            _mark_validation_failed(offer_id)
+            return None
+        offers[offer_id]['processing_step'] = "Condensing Terms"
+        print("Validation check passed. Creating a summary of the offer terms.")
+        return _summarize(page_text, offer_id)
+
+    # Speculative mode: most submitted pages are real offers, so once
+    # validation has had a short head start, run the summary alongside it
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        validation_future = executor.submit(is_banking_offer_page, page_text, offer_id)
+        try:
+            # Pages the local classifier rejects are settled within the head start
+            is_offer = validation_future.result(timeout=SPECULATIVE_SUMMARY_HEAD_START)
+        except FutureTimeoutError:
+            is_offer = None
+        if is_offer is False:
+            _mark_validation_failed(offer_id)
+            return None
+        summary_future = executor.submit(_summarize, page_text, offer_id)
+        if not validation_future.result():
+            print("Discarding speculative summary.")
+            _mark_validation_failed(offer_id)
+            # The summary call may still be running; fold its usage in once it is done
+            summary_future.add_done_callback(lambda future: _store_late_usage(offer_id))
+            return None
+        offers[offer_id]['processing_step'] = "Condensing Terms"
+        print("Validation check passed. Waiting for the speculative summary.")
+        return summary_future.result()
+    finally:
+        executor.shutdown(wait=False)
+
+def scrape_and_process_url(url, offer_id):
+    """Scrapes, summarizes, and triggers the AI extraction process."""
+    try:
+        offers[offer_id]['processing_step'] = "Scraping Website"
+        
+        print(f"Scraping URL: {url}")
+        page_text, reduction = fetch_page(url)
+        offers[offer_id]['content_reduction'] = reduction
+        # Baseline for the background re-crawl's change detection
+        offers[offer_id]['content_digest'] = text_digest(page_text)
+        offers[offer_id]['content_sentences'] = sentence_digests(page_text)
+        offers[offer_id]['content_checked_at'] = datetime.now().isoformat(timespec='seconds')
+
+        offers[offer_id]['processing_step'] = "Validating Offer"
+        print("Scraping successful.")
+
+        if not page_text:
+            raise ValueError("Could not find any text content in the page body.")
+
+        summary_content = _validate_and_summarize(page_text, offer_id)
+        if summary_content is None:
+            return
         
         offers[offer_id]['processing_step'] = "Extracting Details"
         print("Summary created.")
@@ -134,16 +247,22 @@ def scrape_and_process_url(url, offer_id):
             offers[offer_id]['status'] = 'failed'
             offers[offer_id]['processing_step'] = "Scraping Failed"
             offers[offer_id]['details']['bank_name'] = 'Website refused connection'
+            store_offer_usage(offers[offer_id], offer_id)
             # Save the failed offer to storage
             save_offer(offer_id)
+        else:
+            usage_tracker.discard(offer_id)
     except Exception as e:
         print(f"An unexpected error occurred processing offer {offer_id} from {url}: {e}")
         if offer_id in offers:
             offers[offer_id]['status'] = 'failed'
             offers[offer_id]['processing_step'] = "Processing Error"
             offers[offer_id]['details']['bank_name'] = 'An unknown error occurred'
+            store_offer_usage(offers[offer_id], offer_id)
             # Save the failed offer to storage
             save_offer(offer_id)
+        else:
+            usage_tracker.discard(offer_id)
 
 def process_manual_content(content, offer_id):
     """Process manually entered content and triggers the AI extraction process."""
@@ -153,67 +272,14 @@ def process_manual_content(content, offer_id):
         print(f"Processing manual content for offer {offer_id}")
         
         # Clean the content if it's HTML
-        if '<html' in content.lower() or '<body' in content.lower():
-            soup = BeautifulSoup(content, 'html.parser')
-            body_content = soup.body
-            if body_content:
-                for script_or_style in body_content(["script", "style"]):
-                    script_or_style.decompose()
-                page_text = " ".join(body_content.stripped_strings)
-            else:
-                page_text = content
-        else:
-            page_text = content
+        page_text = content_to_text(content)
 
         if not page_text:
             raise ValueError("Could not extract any text content from the provided content.")
 
-        print("Checking if it's a banking offer page.")
-        # Add a small delay to make the validation step visible
-        time.sleep(0.5)
-        if not is_banking_offer_page(page_text):
-            print("AI check failed: Not a banking offer page.")
-            offers[offer_id]['status'] = 'failed'
-            offers[offer_id]['processing_step'] = "Validation Failed"
-            offers[offer_id]['details']['bank_name'] = 'AI Check Failed: Not an offer page.'
-            # Save the failed offer to storage
-            save_offer(offer_id)
+        summary_content = _validate_and_summarize(page_text, offer_id)
+        if summary_content is None:
             return
-
-        offers[offer_id]['processing_step'] = "Condensing Terms"
-        print("Validation check passed. Creating a summary of the offer terms.")
-        summary_prompt = f"""
-        Condense the following bank offer text into a verbose bulleted list of all key terms, conditions, numbers, and dates. 
-
-        IMPORTANT: Prioritize and include information relevant to these specific fields that will be extracted:
-        - Bank name and account title (keep concise, avoid lengthy descriptions)
-        - Cash bonus amounts (including multiple tiers if present)
-        - Minimum qualifying deposit amounts for each tier
-        - Number of required deposits (including direct deposits)
-        - Offer expiration date
-        - Monthly fees and whether they can be waived
-        - Minimum daily balance requirements (NOTE: If multiple account types have different requirements, clearly separate checking vs savings requirements)
-        - Time limits for deposits and bonus payout
-        - Direct deposit requirements
-        - Account holding period to avoid clawback
-        - Clawback clause details
-
-        If there are multiple bonus tiers with different deposit requirements, clearly identify each tier and its requirements.
-        Focus on the most important points that directly affect getting the bonus, avoiding fees, or meeting deadlines. Prioritize critical information over minor details.
-
-        --- RAW TEXT START ---
-        {page_text[-CONTEXT_SIZE:]}
-        --- RAW TEXT END ---
-        """
-        # Try OpenAI first if available, otherwise fall back to Gemini
-        from src.services.ai_clients import call_ai, openai_model_default, OPENAI_ENABLED
-        if OPENAI_ENABLED:
-            summary_content = call_ai(summary_prompt, openai_model_default, use_short_tokens=False)
-        elif pro_model:
-            summary_content = call_gemini(summary_prompt, pro_model, use_short_tokens=False)
-        else:
-            summary_content = "AI Error: No models available"
-        # Summary created successfully (content not logged to console)
         
         offers[offer_id]['processing_step'] = "Extracting Details"
         print("Summary created.")
@@ -225,5 +291,8 @@ def process_manual_content(content, offer_id):
             offers[offer_id]['status'] = 'failed'
             offers[offer_id]['processing_step'] = "Processing Error"
             offers[offer_id]['details']['bank_name'] = 'An unknown error occurred'
+            store_offer_usage(offers[offer_id], offer_id)
             # Save the failed offer to storage
             save_offer(offer_id)
+        else:
+            usage_tracker.discard(offer_id)
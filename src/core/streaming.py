@@ -0,0 +1,48 @@
+import threading
+import time
+from src.data.data_manager import offers, save_offer
+from src.utils.config import STREAM_SAVE_INTERVAL
+
+
+class StreamingFieldWriter:
+    """Writes partial LLM output into an offer's details while it streams.
+
+    The in-memory record is updated on every chunk so API polls see progress
+    right away; saves to storage are coalesced to at most one per interval,
+    and the caller's final save persists the completed value.
+    With line_buffered, only complete lines are published so list-style
+    fields don't flicker with half-written entries.
+    """
+
+    def __init__(self, offer_id, field_name, line_buffered=False, save_interval=STREAM_SAVE_INTERVAL):
+        self.offer_id = offer_id
+        self.field_name = field_name
+        self.line_buffered = line_buffered
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._published = None
+        self._last_save = 0.0
+
+    def __call__(self, partial_text):
+        if self.line_buffered:
+            cut = partial_text.rfind('\n')
+            if cut == -1:
+                return
+            partial_text = partial_text[:cut]
+        partial_text = partial_text.strip()
+        if not partial_text:
+            return
+
+        with self._lock:
+            if partial_text == self._published or self.offer_id not in offers:
+                return
+            # A discarded speculative call may still be streaming into a failed offer
+            if offers[self.offer_id].get('status') == 'failed':
+                return
+            offers[self.offer_id]['details'][self.field_name] = partial_text
+            self._published = partial_text
+            now = time.time()
+            if now - self._last_save < self.save_interval:
+                return
+            self._last_save = now
+        save_offer(self.offer_id)
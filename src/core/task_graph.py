@@ -0,0 +1,96 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraph:
+    """Runs named tasks in threads, starting each one as soon as its dependencies finish.
+
+    A task that raises does not block its dependents; the error is logged and
+    recorded, and dependents run against whatever state the task left behind.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Callable] = {}
+        self._dependencies: Dict[str, List[str]] = {}
+
+    def add(self, name: str, func: Callable, depends_on: Iterable[str] = ()):
+        """Register a task. Dependencies that were never added are ignored."""
+        if name in self._tasks:
+            raise ValueError(f"Task '{name}' is already registered")
+        self._tasks[name] = func
+        self._dependencies[name] = list(depends_on)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def _resolved_dependencies(self) -> Dict[str, List[str]]:
+        return {name: [dep for dep in deps if dep in self._tasks]
+                for name, deps in self._dependencies.items()}
+
+    def _check_acyclic(self, dependencies: Dict[str, List[str]]):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through task '{name}'")
+            visiting.add(name)
+            for dep in dependencies[name]:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in dependencies:
+            visit(name)
+
+    def run(self, max_workers: int = None) -> Dict[str, Exception]:
+        """Run every task and block until all have finished. Returns errors by task name."""
+        dependencies = self._resolved_dependencies()
+        self._check_acyclic(dependencies)
+        if not self._tasks:
+            return {}
+
+        waiting_on = {name: len(deps) for name, deps in dependencies.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in self._tasks}
+        for name, deps in dependencies.items():
+            for dep in deps:
+                dependents[dep].append(name)
+
+        errors: Dict[str, Exception] = {}
+        lock = threading.Lock()
+        all_done = threading.Event()
+        remaining = len(self._tasks)
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(self._tasks))
+
+        def run_task(name):
+            nonlocal remaining
+            try:
+                self._tasks[name]()
+            except Exception as e:
+                logger.error(f"Task '{name}' failed: {e}")
+                errors[name] = e
+            ready = []
+            with lock:
+                for dependent in dependents[name]:
+                    waiting_on[dependent] -= 1
+                    if waiting_on[dependent] == 0:
+                        ready.append(dependent)
+                remaining -= 1
+                if remaining == 0:
+                    all_done.set()
+            for dependent in ready:
+                executor.submit(run_task, dependent)
+
+        try:
+            for name, count in list(waiting_on.items()):
+                if count == 0:
+                    executor.submit(run_task, name)
+            all_done.wait()
+        finally:
+            executor.shutdown(wait=True)
+        return errors
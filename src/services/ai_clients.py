@@ -1,4 +1,8 @@
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 try:
     import google.generativeai as genai
     GEMINI_AVAILABLE = True
@@ -7,7 +11,22 @@ except ImportError:
     genai = None
 from openai import OpenAI
 from src.utils.key_management import load_api_keys
-from src.utils.config import SHORT_PROMPT_MAX_TOKENS, LONG_PROMPT_MAX_TOKENS, CONTEXT_SIZE
+from src.utils.config import (
+    SHORT_PROMPT_MAX_TOKENS,
+    LONG_PROMPT_MAX_TOKENS,
+    VALIDATION_BATCH_WINDOW,
+    VALIDATION_BATCH_MAX_ITEMS,
+    VALIDATION_BATCH_MAX_CHARS,
+    STREAM_PARTIAL_INTERVAL,
+)
+from src.core.context_selection import offer_context
+from src.core.prompt_layout import shared_prefix_prompt
+from src.core.offer_classifier import classify_offer_page
+from src.services.provider_router import ProviderRouter
+from src.services.micro_batcher import MicroBatcher
+from src.utils.tokens import output_token_budget, fit_prompt
+from src.services.usage_tracking import usage_tracker
+from src.services import replay
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,8 +36,20 @@ client = None
 flash_model = None
 pro_model = None
 openai_model_default = "gpt-4.1"
+# Cheaper, faster model for short-answer fields
+openai_model_light = "gpt-4.1-mini"
 OPENAI_ENABLED = False
 
+# Call types that use Gemini Pro rather than Flash when Gemini is configured
+GEMINI_PRO_CALL_TYPES = {'summary', 'refresh'}
+
+# Shared router so latency history and circuit breakers persist across calls
+_router = ProviderRouter()
+
+# Prompt prefix cache accounting, from the cached token counts OpenAI reports
+_cache_stats_lock = threading.Lock()
+_cache_stats = {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+
 # --- AI Configuration ---
 def initialize_ai_clients():
     """Load API keys and initialize AI clients."""
@@ -95,6 +126,14 @@ def initialize_ai_clients():
         flash_model = None
         pro_model = None
 
+    # Record/replay sends OpenAI traffic through the archive and keeps Gemini off
+    if replay.archive is not None:
+        client = replay.RecordReplayClient(replay.archive, real_client=client)
+        OPENAI_ENABLED = True
+        flash_model = None
+        pro_model = None
+        logger.info(f"🎞️ OpenAI calls go through the replay archive ({replay.archive.mode} mode)")
+
     # Final status report
     logger.info(f"🎯 AI Client Initialization Complete:")
     logger.info(f"   OpenAI: {'✅ Enabled' if OPENAI_ENABLED else '❌ Disabled'}")
@@ -102,13 +141,21 @@ def initialize_ai_clients():
     logger.info(f"   Gemini Pro: {'✅ Available' if pro_model else '❌ Not Available'}")
     logger.info(f"   OpenAI Client: {'✅ Created' if client else '❌ Not Created'}")
 
-def call_gemini(prompt, model_instance, use_short_tokens=False, temperature=0):
-    """Generic function to call a specific Gemini API model and return the text response."""
+def call_gemini(prompt, model_instance, use_short_tokens=False, temperature=0, fallback=True, call_type=None,
+                offer_id=None, stage=None):
+    """Generic function to call a specific Gemini API model and return the text response.
+
+    With fallback=False the OpenAI fallback is skipped so the provider router
+    can make that decision itself. call_type selects the output and input
+    token budgets. Usage is recorded against offer_id (one id or a list of
+    ids sharing the call) under stage, which defaults to call_type.
+    """
     if not GEMINI_AVAILABLE or not model_instance:
         return "AI Model Not Configured"
     
     # Determine token limit based on prompt type
-    token_limit = SHORT_PROMPT_MAX_TOKENS if use_short_tokens else LONG_PROMPT_MAX_TOKENS
+    token_limit = _output_token_limit(call_type, use_short_tokens)
+    prompt = fit_prompt(prompt, call_type, model_instance.model_name, token_limit)
     
     # Try Gemini once, then retry once if it fails
     for attempt in range(2):
@@ -129,7 +176,9 @@ def call_gemini(prompt, model_instance, use_short_tokens=False, temperature=0):
                 generation_config=temp_config
             )
             
+            started = time.monotonic()
             response = temp_model.generate_content(prompt)
+            _record_gemini_usage(response, model_instance.model_name, started, stage or call_type, offer_id)
             
             if response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
                 text = response.candidates[0].content.parts[0].text
@@ -162,30 +211,146 @@ def call_gemini(prompt, model_instance, use_short_tokens=False, temperature=0):
                 logger.warning(f"Both Gemini attempts failed. Falling back to OpenAI")
                 break
     
+    if not fallback:
+        return "AI Error: Gemini failed"
     # Gemini failed twice; fall back to OpenAI if available
     if OPENAI_ENABLED and client: # Use 'client' instead of 'openai_model_default'
         logger.info("🔄 Gemini failed twice – switching to OpenAI as fallback")
-        return call_ai(prompt, openai_model_default, use_short_tokens)
+        return call_ai(prompt, openai_model_default, use_short_tokens, call_type=call_type,
+                       offer_id=offer_id, stage=stage)
     # If OpenAI not available, return error
     return "AI Error: Gemini failed and OpenAI not available"
 
 # --- Unified AI Call Helper ---
 
-def call_ai(prompt, model, use_short_tokens=False, temperature=0):
-    """Generic AI call supporting both Gemini model instances and OpenAI ChatGPT model names (string)."""
+def _output_token_limit(call_type, use_short_tokens):
+    """Output budget for the call type, or the short/long limit for untyped calls."""
+    return output_token_budget(call_type, SHORT_PROMPT_MAX_TOKENS if use_short_tokens else LONG_PROMPT_MAX_TOKENS)
+
+def _record_prompt_cache_usage(usage):
+    """Adds one response's prompt and cached token counts to the running totals."""
+    if not usage:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    with _cache_stats_lock:
+        _cache_stats['calls'] += 1
+        _cache_stats['prompt_tokens'] += prompt_tokens
+        _cache_stats['cached_tokens'] += cached_tokens
+    if prompt_tokens:
+        logger.debug(f"Prompt cache: {cached_tokens}/{prompt_tokens} prompt tokens cached")
+
+def get_prompt_cache_stats():
+    """Returns the share of prompt tokens served from the provider's prefix cache."""
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    stats['cached_ratio'] = round(stats['cached_tokens'] / stats['prompt_tokens'], 4) if stats['prompt_tokens'] else 0.0
+    return stats
+
+def _offer_ids(offer_id):
+    if offer_id is None:
+        return ()
+    if isinstance(offer_id, (list, tuple, set)):
+        return tuple(offer_id)
+    return (offer_id,)
+
+def _record_openai_usage(usage, model, started, stage, offer_id):
+    """Records token counts, latency and cost for one OpenAI response."""
+    _record_prompt_cache_usage(usage)
+    if not usage:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    usage_tracker.record(
+        model, stage,
+        prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+        completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+        cached_tokens=(getattr(details, 'cached_tokens', 0) or 0) if details else 0,
+        latency=time.monotonic() - started,
+        offer_ids=_offer_ids(offer_id))
+
+def _record_gemini_usage(response, model_name, started, stage, offer_id):
+    """Records token counts, latency and cost for one Gemini response."""
+    metadata = getattr(response, 'usage_metadata', None)
+    if not metadata:
+        return
+    usage_tracker.record(
+        model_name.split('/')[-1], stage,
+        prompt_tokens=getattr(metadata, 'prompt_token_count', 0) or 0,
+        completion_tokens=getattr(metadata, 'candidates_token_count', 0) or 0,
+        cached_tokens=getattr(metadata, 'cached_content_token_count', 0) or 0,
+        latency=time.monotonic() - started,
+        offer_ids=_offer_ids(offer_id))
+
+def _stream_openai(prompt, model, token_limit, temperature, on_partial, stage=None, offer_id=None):
+    """Streams an OpenAI completion, passing the text so far to on_partial as it grows.
+
+    on_partial is called at most once per STREAM_PARTIAL_INTERVAL and once
+    more with the complete text.
+    """
+    started = time.monotonic()
+    stream = client.chat.completions.create(
+    model=model,
+    messages=[{"role": "user", "content": prompt}],
+    max_tokens=token_limit,
+    temperature=temperature,
+    stream=True,
+    stream_options={"include_usage": True})
+    text = ""
+    published = ""
+    last_partial = 0.0
+    for chunk in stream:
+        # The final chunk carries usage and no choices
+        if getattr(chunk, 'usage', None):
+            _record_openai_usage(chunk.usage, model, started, stage, offer_id)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            text += delta
+            now = time.monotonic()
+            if now - last_partial >= STREAM_PARTIAL_INTERVAL:
+                last_partial = now
+                published = text
+                on_partial(text)
+    if text != published:
+        on_partial(text)
+    text = text.strip()
+    if not text:
+        logger.warning("OpenAI API returned no content")
+        return "AI Error: No content returned"
+    logger.info(f"OpenAI API call successful using model: {model} (streamed)")
+    return text
+
+def call_ai(prompt, model, use_short_tokens=False, temperature=0, on_partial=None, call_type=None,
+            offer_id=None, stage=None):
+    """Generic AI call supporting both Gemini model instances and OpenAI ChatGPT model names (string).
+
+    If on_partial is given, OpenAI responses are streamed and on_partial is
+    called with the accumulated text as it grows. call_type selects
+    the output and input token budgets. Usage is recorded against offer_id
+    under stage, which defaults to call_type.
+    """
     # If model is a string -> assume OpenAI ChatCompletion
     if isinstance(model, str):
         if not OPENAI_ENABLED:
             return "AI Model Not Configured"
         try:
             # Determine token limit based on prompt type
-            token_limit = SHORT_PROMPT_MAX_TOKENS if use_short_tokens else LONG_PROMPT_MAX_TOKENS
+            token_limit = _output_token_limit(call_type, use_short_tokens)
+            prompt = fit_prompt(prompt, call_type, model, token_limit)
+
+            if on_partial:
+                return _stream_openai(prompt, model, token_limit, temperature, on_partial,
+                                      stage=stage or call_type, offer_id=offer_id)
             
+            started = time.monotonic()
             response = client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": prompt}],
             max_tokens=token_limit,
             temperature=temperature)
+            _record_openai_usage(getattr(response, 'usage', None), model, started, stage or call_type, offer_id)
             if response.choices and response.choices[0].message:
                 logger.info(f"OpenAI API call successful using model: {model}")
                 return response.choices[0].message.content.strip()
@@ -196,28 +361,162 @@ def call_ai(prompt, model, use_short_tokens=False, temperature=0):
             return "AI Error"
     else:
         # Fallback to Gemini style call (reuse call_gemini)
-        return call_gemini(prompt, model, use_short_tokens)
+        return call_gemini(prompt, model, use_short_tokens, call_type=call_type, offer_id=offer_id, stage=stage)
 
 
-def is_banking_offer_page(content):
-    """Uses AI to determine if the page content is a banking offer."""
-    prompt = f"""
-    Analyze the following text from a webpage. Does it describe a bank account bonus, promotion, or new account offer?
-    Please answer with only 'yes' or 'no'.
+def call_ai_samples(prompt, model, n=3, use_short_tokens=False, temperature=0.5, call_type=None,
+                    offer_id=None, stage=None):
+    """Sample up to n answers for the same prompt, using one multi-choice request when the provider supports it.
 
-    --- TEXT START ---
-    {content[-CONTEXT_SIZE:]}
-    --- TEXT END ---
+    OpenAI may return fewer than n choices; only the samples actually
+    returned are in the list.
     """
-    
-    # Try OpenAI first if available, otherwise fall back to Gemini
-    if OPENAI_ENABLED:
-        response = call_ai(prompt, openai_model_default, use_short_tokens=True)
-    elif flash_model:
-        response = call_gemini(prompt, flash_model, use_short_tokens=True)
+    if isinstance(model, str):
+        if not OPENAI_ENABLED:
+            return ["AI Model Not Configured"] * n
+        try:
+            token_limit = _output_token_limit(call_type, use_short_tokens)
+            prompt = fit_prompt(prompt, call_type, model, token_limit)
+
+            started = time.monotonic()
+            response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=token_limit,
+            temperature=temperature,
+            n=n)
+            _record_openai_usage(getattr(response, 'usage', None), model, started, stage or call_type, offer_id)
+            samples = [choice.message.content.strip() for choice in response.choices
+                       if choice.message and choice.message.content]
+            if not samples:
+                logger.warning("OpenAI API returned no content")
+                return ["AI Error: No content returned"] * n
+            logger.info(f"OpenAI API call successful using model: {model} ({len(samples)} samples)")
+            return samples
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return ["AI Error"] * n
+    # Gemini has no multi-choice call here; sample with parallel calls
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        futures = [executor.submit(call_gemini, prompt, model, use_short_tokens, temperature=temperature,
+                                   call_type=call_type, offer_id=offer_id, stage=stage) for _ in range(n)]
+        return [future.result() for future in futures]
+
+
+def call_routed(prompt, call_type, use_short_tokens=False, temperature=0, on_partial=None, offer_id=None, stage=None,
+                model=None):
+    """Calls whichever configured provider answers first, hedging and circuit breaking across OpenAI and Gemini.
+
+    model overrides the OpenAI model; Gemini picks Pro or Flash by call type.
+    """
+    providers = []
+    if OPENAI_ENABLED and client:
+        providers.append(('openai', lambda: call_ai(prompt, model or openai_model_default, use_short_tokens, temperature, on_partial=on_partial,
+                                                  call_type=call_type, offer_id=offer_id, stage=stage)))
+    if call_type in GEMINI_PRO_CALL_TYPES:
+        gemini_model = pro_model or flash_model
     else:
-        logger.error("No AI models available for banking offer validation")
-        return False
-    
+        gemini_model = flash_model or pro_model
+    if gemini_model:
+        providers.append(('gemini', lambda: call_gemini(prompt, gemini_model, use_short_tokens, temperature, fallback=False,
+                                                      call_type=call_type, offer_id=offer_id, stage=stage)))
+    if not providers:
+        return "AI Error: No models available"
+    # Two streams writing into the same field would interleave, so streamed calls only fail over
+    return _router.call(call_type, providers, hedge=on_partial is None)
+
+
+def get_router_stats():
+    """Circuit breaker states and hedging counters for the provider router."""
+    return _router.snapshot()
+
+
+def get_usage_stats():
+    """Token, latency and cost totals by stage and model since startup."""
+    return usage_tracker.snapshot()
+
+
+def _classify_offer_page(context, offer_id=None):
+    """Ask whether a single page's context describes a banking offer."""
+    prompt = shared_prefix_prompt("WEBSITE TEXT", context, """
+    Analyze the text above from a webpage. Does it describe a bank account bonus, promotion, or new account offer?
+    Please answer with only 'yes' or 'no'.
+    """)
+    response = call_routed(prompt, 'validation', use_short_tokens=True, offer_id=offer_id)
     logger.info(f"AI Check for Banking Offer Page. Response: '{response}'")
     return "yes" in response.lower()
+
+
+# Matches answer lines like '2: yes' or 'Page 3 - no' in a batch response
+_BATCH_ANSWER_PATTERN = re.compile(r"^\W*(?:page\s*)?(\d+)\s*[:.)\-]\s*(yes|no)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def _build_batch_validation_prompt(contexts):
+    pages = "\n\n".join(
+        f"--- PAGE {i} START ---\n{context}\n--- PAGE {i} END ---"
+        for i, context in enumerate(contexts, start=1)
+    )
+    # Page content first, like the single-page prompt, so the instructions don't push it out of the cached prefix
+    return f"""{pages}
+
+For each numbered webpage above, decide whether it describes a bank account bonus, promotion, or new account offer.
+Answer with exactly one line per page in the form '<page number>: yes' or '<page number>: no', and nothing else.
+"""
+
+
+def _classify_offer_pages(items):
+    """Classify a batch of (page context, offer id) items with one request, one yes/no per page.
+
+    Pages the model leaves out of its answer come back as None, and the
+    batcher checks each of them on its own, so a malformed batch response
+    costs extra calls rather than wrong answers.
+    """
+    contexts = [context for context, _ in items]
+    response = call_routed(_build_batch_validation_prompt(contexts), 'validation_batch', use_short_tokens=True,
+                           offer_id=[offer_id for _, offer_id in items], stage='validation')
+    logger.info(f"AI Check for {len(contexts)} Banking Offer Pages. Response: '{response}'")
+    answers = {}
+    for match in _BATCH_ANSWER_PATTERN.finditer(response or ""):
+        answers.setdefault(int(match.group(1)), match.group(2).lower() == 'yes')
+
+    results = []
+    for i in range(1, len(items) + 1):
+        if i not in answers:
+            logger.warning(f"Batch validation response had no answer for page {i}; checking it on its own")
+        results.append(answers.get(i))
+    return results
+
+
+# Validation prompts from offers in flight at the same time share one request
+_validation_batcher = MicroBatcher(
+    _classify_offer_pages,
+    window=VALIDATION_BATCH_WINDOW,
+    max_items=VALIDATION_BATCH_MAX_ITEMS,
+    max_chars=VALIDATION_BATCH_MAX_CHARS,
+    size_of=lambda item: len(item[0]),
+    process_one=lambda item: _classify_offer_page(*item),
+)
+
+
+def is_banking_offer_page(content, offer_id=None):
+    """Determines if the page content is a banking offer.
+
+    Pages the local classifier is sure about (plain bonus terms, or empty,
+    error, captcha and login pages) are decided without the AI; everything
+    else is sent to it.
+    """
+    verdict, reason = classify_offer_page(content)
+    if verdict == 'offer':
+        logger.info(f"Local offer classifier accepted the page ({reason}); skipping AI check")
+        return True
+    if verdict == 'not_offer':
+        logger.info(f"Local offer classifier rejected the page ({reason}); skipping AI check")
+        return False
+
+    if not OPENAI_ENABLED and not flash_model and not pro_model:
+        logger.error("No AI models available for banking offer validation")
+        return False
+    if replay.archive is not None:
+        # A batched prompt depends on which pages happen to share the window
+        return _classify_offer_page(offer_context(content), offer_id)
+    return _validation_batcher.submit((offer_context(content), offer_id))
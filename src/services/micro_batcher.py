@@ -0,0 +1,105 @@
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects items submitted from many threads within a short window and processes them in one call.
+
+    process_batch receives the list of items and must return one result per
+    item, in order. Each submitting thread blocks until its own result is
+    ready. An item submitted while no other submitter is waiting is sent at
+    once; items that arrive while others are in flight are held until the
+    window closes, the batch reaches max_items, or adding another item would
+    exceed max_chars.
+
+    With process_one, a batch of a single item and any item the batch
+    returns None for are processed on their own by the submitting thread,
+    so these calls run concurrently rather than one after another in
+    whichever thread sent the batch.
+    """
+
+    def __init__(self, process_batch: Callable[[List], Sequence], window: float, max_items: int,
+                 max_chars: int = None, size_of: Callable = len, process_one: Callable = None):
+        self.process_batch = process_batch
+        self.process_one = process_one
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.size_of = size_of
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_chars = 0
+        # Submitters that have not had their result yet
+        self._waiting = 0
+        self._timer = None
+
+    def submit(self, item):
+        """Add an item to the current batch and wait for its result."""
+        future = Future()
+        ready = []
+        with self._lock:
+            self._waiting += 1
+            item_chars = self.size_of(item)
+            if self._pending and self.max_chars and self._pending_chars + item_chars > self.max_chars:
+                # This item would overflow the batch; send what we have first
+                ready.append(self._take_pending())
+            self._pending.append((item, future))
+            self._pending_chars += item_chars
+            if len(self._pending) >= self.max_items or self._waiting == 1:
+                # Nothing to wait for: a full batch, or no one else to batch with
+                ready.append(self._take_pending())
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        try:
+            # Ready batches are sent from the submitting thread rather than waiting for the timer
+            for batch in ready:
+                self._run(batch)
+            result = future.result()
+            if result is None and self.process_one is not None:
+                return self.process_one(item)
+            return result
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _take_pending(self):
+        batch = self._pending
+        self._pending = []
+        self._pending_chars = 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+            if not self._pending:
+                return
+            batch = self._take_pending()
+        self._run(batch)
+
+    def _run(self, batch):
+        if len(batch) == 1 and self.process_one is not None:
+            # Its submitter sends a lone item on its own
+            batch[0][1].set_result(None)
+            return
+        items = [item for item, _ in batch]
+        try:
+            results = list(self.process_batch(items))
+            if len(results) != len(items):
+                raise ValueError(f"Batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            logger.error(f"Batch of {len(items)} item(s) failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,236 @@
+import threading
+import time
+import logging
+from collections import defaultdict, deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.config import (
+    HEDGE_DEFAULT_DELAYS,
+    HEDGE_MIN_SAMPLES,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# A provider is a name plus a zero-argument callable that returns the response text
+Provider = Tuple[str, Callable[[], str]]
+
+
+def is_failed_response(result) -> bool:
+    """The AI helpers report failures as text rather than raising."""
+    return (not result or not isinstance(result, str) or result.startswith("AI Error")
+            or result in ("AI Model Not Configured",))
+
+
+class CircuitBreaker:
+    """Stops sending traffic to a provider after repeated failures.
+
+    closed -> open after failure_threshold consecutive failures; open ->
+    half_open once reset_timeout has passed, letting one trial call through;
+    the trial's outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str = 'provider', failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failure(s)")
+                self.state = 'open'
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Keeps a sliding window of successful call latencies per provider and call type."""
+
+    def __init__(self, window: int = 100):
+        self._samples: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, call_type: str, seconds: float):
+        with self._lock:
+            self._samples[(provider, call_type)].append(seconds)
+
+    def p95(self, provider: str, call_type: str, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((provider, call_type), ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+
+
+class _Attempt:
+    """One provider call running on its own thread."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.future = Future()
+        self.running = threading.Event()
+        self.started_at = 0.0
+
+
+class ProviderRouter:
+    """Routes a call to the first healthy provider and hedges to the next one when it runs slow.
+
+    The hedge fires once the primary has been running longer than its p95
+    latency for the call type (or the configured default while there are too
+    few samples). Whichever successful answer arrives first wins; the other
+    call is left to finish in the background and its result is discarded.
+    A provider whose call fails outright is skipped straight to the next one.
+    Providers with an open circuit are skipped while another one is allowed;
+    when none is, the last provider is still tried.
+    Every provider call gets its own thread, so calls never queue behind each
+    other, and the hedge clock starts when the primary call starts running.
+    """
+
+    def __init__(self, default_delays: Dict[str, float] = None,
+                 breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker):
+        self.default_delays = default_delays if default_delays is not None else HEDGE_DEFAULT_DELAYS
+        self.latency = LatencyTracker()
+        self._breaker_factory = breaker_factory
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self.stats = defaultdict(int)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = self._breaker_factory(provider)
+            return self._breakers[provider]
+
+    def hedge_delay(self, provider: str, call_type: str) -> float:
+        p95 = self.latency.p95(provider, call_type)
+        if p95 is not None:
+            return p95
+        return self.default_delays.get(call_type, self.default_delays.get('default', 10.0))
+
+    def _run(self, attempt: _Attempt, func: Callable[[], str], call_type: str):
+        name = attempt.name
+        attempt.future.set_running_or_notify_cancel()
+        start = attempt.started_at = time.monotonic()
+        attempt.running.set()
+        try:
+            result = func()
+        except Exception as e:
+            logger.error(f"Provider {name} raised during {call_type} call: {e}")
+            result = "AI Error"
+        if is_failed_response(result):
+            self.breaker(name).record_failure()
+        else:
+            self.breaker(name).record_success()
+            self.latency.record(name, call_type, time.monotonic() - start)
+        attempt.future.set_result((name, result))
+
+    def _start(self, name: str, func: Callable[[], str], call_type: str) -> _Attempt:
+        attempt = _Attempt(name)
+        threading.Thread(target=self._run, args=(attempt, func, call_type), name=f'ai-router-{name}',
+                         daemon=True).start()
+        return attempt
+
+    def call(self, call_type: str, providers: Sequence[Provider], hedge: bool = True) -> str:
+        """Run the call against the providers in priority order and return the first good answer."""
+        remaining: List[Provider] = list(providers)
+        if not remaining:
+            return "AI Error: No models available"
+
+        def start_next():
+            while remaining:
+                name, func = remaining.pop(0)
+                if self.breaker(name).allow_request():
+                    return self._start(name, func, call_type)
+                self._count('skipped_open_circuit')
+                logger.info(f"Skipping {name} for {call_type} call: circuit open")
+            return None
+
+        started = start_next()
+        if started is None:
+            # Every circuit is open. Failing without a call would only give the
+            # same error, so try the last provider rather than nothing at all
+            name, func = providers[-1]
+            self._count('forced_open_circuit')
+            logger.info(f"All circuits open for {call_type} call; trying {name} anyway")
+            started = self._start(name, func, call_type)
+        primary = started
+        primary_name = primary.name
+        pending = {primary.future}
+        last_result = "AI Error"
+        hedged = False
+
+        while pending:
+            timeout = None
+            if hedge and not hedged and remaining:
+                primary.running.wait()
+                deadline = primary.started_at + self.hedge_delay(primary_name, call_type)
+                timeout = max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Primary is slower than usual: send a duplicate to the next provider
+                hedged = True
+                started = start_next()
+                if started:
+                    self._count('hedges_sent')
+                    logger.info(f"Hedging {call_type} call from {primary_name} to {started.name}")
+                    pending.add(started.future)
+                continue
+
+            for future in done:
+                name, result = future.result()
+                if not is_failed_response(result):
+                    if name != primary_name:
+                        self._count('hedge_wins' if hedged else 'fallbacks')
+                    return result
+                last_result = result
+
+            # Everything that finished failed; fall through to the next provider
+            if not pending:
+                started = start_next()
+                if started:
+                    logger.info(f"Falling back to {started.name} for {call_type} call")
+                    pending.add(started.future)
+        return last_result
+
+    def snapshot(self) -> Dict:
+        """Breaker states and counters, for diagnostics."""
+        with self._lock:
+            breakers = {name: {'state': breaker.state, 'failures': breaker.failures}
+                        for name, breaker in self._breakers.items()}
+            stats = dict(self.stats)
+        return {'breakers': breakers, 'stats': stats}
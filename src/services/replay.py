@@ -0,0 +1,255 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import zipfile
+from types import SimpleNamespace
+
+import requests
+
+from src.utils.config import REPLAY_MODE, REPLAY_ARCHIVE
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept with a recorded page; the rest only matter on the wire
+_RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Retry-After')
+
+
+class MissingRecording(Exception):
+    pass
+
+
+def request_key(kwargs):
+    """Stable key for a chat completion request."""
+    relevant = {name: kwargs.get(name) for name in ('model', 'messages', 'n', 'max_tokens', 'temperature')}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _usage(recorded):
+    usage = recorded.get('usage') or {}
+    return SimpleNamespace(
+        prompt_tokens=usage.get('prompt_tokens', 0),
+        completion_tokens=usage.get('completion_tokens', 0),
+        prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get('cached_tokens', 0)),
+    )
+
+
+def _usage_dict(usage):
+    if not usage:
+        return {}
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_tokens': (getattr(details, 'cached_tokens', 0) or 0) if details else 0,
+    }
+
+
+class ReplayArchive:
+    """Recorded page fetches and OpenAI chat completions, kept together in one zip file.
+
+    Pages are stored under a hash of their URL as http/<key>.json (status,
+    headers, encoding or the fetch error) plus http/<key>.body, and chat
+    completions under a hash of the request as llm/<key>.json. The archive is
+    held in memory; in record mode save() writes it back, and it is also
+    saved when the process exits.
+    """
+
+    def __init__(self, path, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown replay mode '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.pages = {}
+        self.completions = {}
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._load()
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    def _load(self):
+        with zipfile.ZipFile(self.path) as archive:
+            names = set(archive.namelist())
+            for name in names:
+                folder, _, filename = name.partition('/')
+                if not filename.endswith('.json'):
+                    continue
+                key = filename[:-len('.json')]
+                entry = json.loads(archive.read(name))
+                if folder == 'llm':
+                    self.completions[key] = entry
+                elif folder == 'http':
+                    body_name = f"http/{key}.body"
+                    entry['body'] = archive.read(body_name) if body_name in names else b""
+                    self.pages[key] = entry
+        logger.info(f"Loaded replay archive {self.path}: {len(self.pages)} pages, {len(self.completions)} completions")
+
+    def save(self):
+        if not self.recording:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            pages, completions = dict(self.pages), dict(self.completions)
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for key, entry in sorted(pages.items()):
+                meta = {name: value for name, value in entry.items() if name != 'body'}
+                archive.writestr(f"http/{key}.json", json.dumps(meta, sort_keys=True))
+                archive.writestr(f"http/{key}.body", entry['body'])
+            for key, recorded in sorted(completions.items()):
+                archive.writestr(f"llm/{key}.json", json.dumps(recorded, sort_keys=True))
+        os.replace(tmp_path, self.path)
+
+    def missing(self, message):
+        """Count a request that has no recording and raise MissingRecording."""
+        with self._lock:
+            self.misses += 1
+        raise MissingRecording(message)
+
+    def record_response(self, url, response):
+        """Save a fetched page. Reads the whole body, which stays readable on the response."""
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in _RECORDED_HEADERS if name in response.headers},
+            'encoding': response.encoding,
+            'body': response.content,
+        }
+        with self._lock:
+            self.pages[url_key(url)] = entry
+            self._dirty = True
+
+    def record_completion(self, key, recorded):
+        with self._lock:
+            self.completions[key] = recorded
+            self._dirty = True
+
+    def record_error(self, url, exc):
+        with self._lock:
+            self.pages[url_key(url)] = {'url': url, 'error': str(exc), 'body': b""}
+            self._dirty = True
+
+    def replay_response(self, url):
+        """The recorded response for url as a requests.Response. A recorded fetch error is raised again."""
+        entry = self.pages.get(url_key(url))
+        if entry is None:
+            self.missing(f"No recorded page for {url}")
+        if 'error' in entry:
+            raise requests.RequestException(entry['error'])
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers.update(entry['headers'])
+        response.encoding = entry['encoding']
+        response.url = url
+        response._content = entry['body']
+        response._content_consumed = True
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'mode': self.mode, 'path': self.path, 'pages': len(self.pages),
+                    'completions': len(self.completions), 'misses': self.misses}
+
+
+class RecordReplayClient:
+    """Stands in for the OpenAI client and answers chat completions from a ReplayArchive.
+
+    In record mode each request goes to the real client and its response
+    text and usage are saved under a hash of the request. In replay mode a
+    request with no recording fails like an API error.
+    """
+
+    def __init__(self, archive, real_client=None):
+        if archive.recording and real_client is None:
+            raise ValueError("Record mode needs a real OpenAI client")
+        self.archive = archive
+        self.real_client = real_client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @property
+    def misses(self):
+        return self.archive.misses
+
+    def save(self):
+        self.archive.save()
+
+    def _create(self, **kwargs):
+        key = request_key(kwargs)
+        recorded = self.archive.completions.get(key)
+        if recorded is None:
+            if not self.archive.recording:
+                self.archive.missing(f"No recorded response for request {key[:12]}")
+            recorded = self._record(key, kwargs)
+        if kwargs.get('stream'):
+            return self._replay_stream(recorded)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text)) for text in recorded['choices']],
+            usage=_usage(recorded),
+        )
+
+    def _record(self, key, kwargs):
+        response = self.real_client.chat.completions.create(**kwargs)
+        if kwargs.get('stream'):
+            parts, usage = [], None
+            for chunk in response:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+            recorded = {'choices': ["".join(parts)], 'usage': _usage_dict(usage)}
+        else:
+            recorded = {'choices': [choice.message.content for choice in response.choices],
+                        'usage': _usage_dict(getattr(response, 'usage', None))}
+        self.archive.record_completion(key, recorded)
+        return recorded
+
+    def _replay_stream(self, recorded):
+        text = recorded['choices'][0] if recorded['choices'] else ""
+        # Split into word-sized deltas so streaming consumers see several chunks
+        words = text.split(' ')
+        for i, word in enumerate(words):
+            delta = word if i == len(words) - 1 else word + ' '
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))], usage=None)
+        yield SimpleNamespace(choices=[], usage=_usage(recorded))
+
+
+# The active archive, or None when record/replay is off
+archive = None
+
+
+def configure_replay(mode, path=REPLAY_ARCHIVE):
+    """Switch record/replay on ('record' or 'replay') or off ('off') for this process."""
+    global archive
+    if archive is not None:
+        archive.save()
+    archive = None if mode == 'off' else ReplayArchive(path, mode)
+    if archive is not None:
+        logger.info(f"Replay mode '{mode}' using {path}")
+    return archive
+
+
+def replay_stats():
+    return archive.stats() if archive is not None else {'mode': 'off'}
+
+
+def _save_on_exit():
+    if archive is not None:
+        archive.save()
+
+
+atexit.register(_save_on_exit)
+configure_replay(REPLAY_MODE)
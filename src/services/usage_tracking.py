@@ -0,0 +1,153 @@
+import threading
+import logging
+from collections import defaultdict, deque
+
+from src.utils.config import MODEL_PRICING
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ('calls', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'latency_seconds', 'cost_usd')
+
+# Counters divided between the offers that shared a call. Every offer still
+# counts the call itself and waited for its full latency.
+_SPLIT_COUNTERS = ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost_usd')
+
+
+def _empty():
+    return {counter: 0 for counter in _COUNTERS}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Dollar cost of one call from the per-million-token prices in MODEL_PRICING."""
+    pricing = MODEL_PRICING.get(model)
+    if not pricing:
+        return 0.0
+    uncached = max(0, prompt_tokens - cached_tokens)
+    cached_price = pricing.get('cached_input', pricing['input'])
+    return (uncached * pricing['input'] + cached_tokens * cached_price
+            + completion_tokens * pricing['output']) / 1_000_000
+
+
+def _add(target, values, share=1.0):
+    for counter in _COUNTERS:
+        value = values.get(counter, 0)
+        target[counter] = target.get(counter, 0) + (value * share if counter in _SPLIT_COUNTERS else value)
+
+
+def _rounded(totals):
+    rounded = {}
+    for counter, value in totals.items():
+        if counter == 'cost_usd':
+            rounded[counter] = round(value, 6)
+        elif counter == 'latency_seconds':
+            rounded[counter] = round(value, 3)
+        else:
+            rounded[counter] = round(value, 1) if value != int(value) else int(value)
+    return rounded
+
+
+def merge_usage(existing, delta):
+    """Add a usage breakdown ({'totals', 'stages', 'models'}) onto another."""
+    merged = {'totals': dict((existing or {}).get('totals', {})),
+              'stages': {k: dict(v) for k, v in (existing or {}).get('stages', {}).items()},
+              'models': {k: dict(v) for k, v in (existing or {}).get('models', {}).items()}}
+    _add(merged['totals'], delta.get('totals', {}))
+    for group in ('stages', 'models'):
+        for key, values in delta.get(group, {}).items():
+            _add(merged[group].setdefault(key, _empty()), values)
+    merged['totals'] = _rounded(merged['totals'])
+    for group in ('stages', 'models'):
+        merged[group] = {key: _rounded(values) for key, values in merged[group].items()}
+    return merged
+
+
+class UsageTracker:
+    """Accumulates token counts, latency and cost per offer, stage and model.
+
+    Per-offer usage is held as a pending delta until the pipeline folds it
+    into the stored offer with store_offer_usage, so totals survive restarts
+    and refreshes add to what was recorded before.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._process = {'totals': _empty(), 'stages': defaultdict(_empty), 'models': defaultdict(_empty)}
+        # Recent per-call latencies by stage, for percentiles
+        self._latencies = defaultdict(lambda: deque(maxlen=1000))
+
+    def record(self, model, stage, prompt_tokens, completion_tokens, cached_tokens=0,
+               latency=0.0, offer_ids=()):
+        """Record one provider call. Tokens and cost of a call shared by several offers are split evenly."""
+        values = {
+            'calls': 1,
+            'prompt_tokens': prompt_tokens or 0,
+            'completion_tokens': completion_tokens or 0,
+            'cached_tokens': cached_tokens or 0,
+            'latency_seconds': latency or 0.0,
+            'cost_usd': estimate_cost(model, prompt_tokens or 0, completion_tokens or 0, cached_tokens or 0),
+        }
+        stage = stage or 'other'
+        offer_ids = [offer_id for offer_id in offer_ids if offer_id is not None]
+        with self._lock:
+            for group, key in (('totals', None), ('stages', stage), ('models', model)):
+                target = self._process[group] if key is None else self._process[group][key]
+                _add(target, values)
+            self._latencies[stage].append(values['latency_seconds'])
+            for offer_id in offer_ids:
+                pending = self._pending.setdefault(offer_id, {'totals': _empty(), 'stages': {}, 'models': {}})
+                share = 1.0 / len(offer_ids)
+                _add(pending['totals'], values, share)
+                _add(pending['stages'].setdefault(stage, _empty()), values, share)
+                _add(pending['models'].setdefault(model, _empty()), values, share)
+        logger.debug(f"Usage: {stage} on {model}: {values['prompt_tokens']} in / "
+                     f"{values['completion_tokens']} out, {values['latency_seconds']:.2f}s, ${values['cost_usd']:.5f}")
+
+    def drain(self, offer_id):
+        """Return and clear the usage recorded for an offer since the last drain."""
+        with self._lock:
+            return self._pending.pop(offer_id, None)
+
+    def pending(self, offer_id):
+        """A copy of the usage recorded for an offer since the last drain, leaving it pending."""
+        with self._lock:
+            delta = self._pending.get(offer_id)
+            return merge_usage(None, delta) if delta else None
+
+    def discard(self, offer_id):
+        """Drop the pending usage of an offer that no longer exists."""
+        with self._lock:
+            self._pending.pop(offer_id, None)
+
+    def latency_samples(self):
+        """Recent per-call latencies in seconds, by stage."""
+        with self._lock:
+            return {stage: list(samples) for stage, samples in self._latencies.items()}
+
+    def snapshot(self):
+        """Process-wide usage since startup."""
+        with self._lock:
+            return {
+                'totals': _rounded(self._process['totals']),
+                'stages': {key: _rounded(values) for key, values in self._process['stages'].items()},
+                'models': {key: _rounded(values) for key, values in self._process['models'].items()},
+            }
+
+
+usage_tracker = UsageTracker()
+
+
+def store_offer_usage(offer, offer_id):
+    """Fold the offer's pending usage into offer['usage']. Returns the offer's usage."""
+    delta = usage_tracker.drain(offer_id)
+    if delta:
+        offer['usage'] = merge_usage(offer.get('usage'), delta)
+    return offer.get('usage')
+
+
+def offer_usage(offer, offer_id):
+    """The offer's stored usage plus anything still pending, without draining it."""
+    delta = usage_tracker.pending(offer_id)
+    if delta:
+        return merge_usage(offer.get('usage'), delta)
+    return offer.get('usage')
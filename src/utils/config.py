@@ -1,3 +1,5 @@
+import os
+
 # A list of common User-Agent strings to rotate through
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
@@ -6,13 +8,190 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/115.0",
 ]
 
+# Scraping sessions are pooled per host: connections kept per host, idle
+# seconds before a host's session is closed, and the number of hosts kept
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 8
+HTTP_POOL_IDLE_SECONDS = 300
+HTTP_POOL_MAX_HOSTS = 64
+
+# Concurrent page fetches across all hosts and to any single host, and the
+# connect and read timeouts in seconds for each attempt
+SCRAPE_GLOBAL_CONCURRENCY = 8
+SCRAPE_PER_HOST_CONCURRENCY = 2
+SCRAPE_CONNECT_TIMEOUT = 5
+SCRAPE_READ_TIMEOUT = 20
+
+# Politeness per host: sustained requests per second and burst size of each
+# host's token bucket, and the longest Retry-After that is honored
+SCRAPE_HOST_REQUESTS_PER_SECOND = 1.0
+SCRAPE_HOST_BURST = 3
+SCRAPE_MAX_RETRY_AFTER = 300
+
+# Page downloads are parsed as they stream in, in chunks of this many bytes,
+# and cut off after HTML_MAX_BYTES
+HTML_MAX_BYTES = 5 * 1024 * 1024
+HTML_STREAM_CHUNK_BYTES = 64 * 1024
+
+# Boilerplate removal on page text: blocks whose text is more than
+# CONTENT_MAX_LINK_DENSITY link text are dropped, as are blocks shorter than
+# CONTENT_SHORT_BLOCK_WORDS words with no digits between two dropped blocks.
+# Repeated blocks are kept once. If less than CONTENT_MIN_KEEP_RATIO of the
+# text would be left, only the repeats are removed.
+CONTENT_MAX_LINK_DENSITY = 0.5
+CONTENT_SHORT_BLOCK_WORDS = 4
+CONTENT_MIN_KEEP_RATIO = 0.2
+
+# CPU-heavy stages (HTML parsing, passage ranking, rule extraction) run in a
+# pool of worker processes so they don't hold the web server's GIL. Inputs
+# shorter than CPU_POOL_MIN_CHARS run inline, and inputs of at least
+# CPU_POOL_SHARED_MEMORY_BYTES are handed over through shared memory instead
+# of being pickled. Set CPU_POOL_WORKERS to 0 to run everything inline.
+# Spawned workers import only the modules their tasks need, not app.py.
+CPU_POOL_WORKERS = 2
+CPU_POOL_START_METHOD = 'spawn'
+CPU_POOL_MIN_CHARS = 20000
+CPU_POOL_SHARED_MEMORY_BYTES = 256 * 1024
+
+# On-disk cache of fetched pages. Pages checked within the freshness window
+# are reused without a request; older ones are revalidated with their ETag
+# and Last-Modified validators
+HTTP_CACHE_DIR = 'data/http_cache'
+HTTP_CACHE_FRESH_SECONDS = 300
+HTTP_CACHE_MAX_ENTRIES = 500
+
+# Fields queried in parallel by a batch field refresh
+REFRESH_BATCH_WORKERS = 4
+
+# Background re-crawl of completed URL offers: an offer is fetched again
+# RECRAWL_INTERVAL_SECONDS after its last check, at most RECRAWL_RATE_PER_MINUTE
+# pages a minute, and re-extracted only when its normalized text changed.
+# A change touching less than RECRAWL_MIN_CHANGE_RATIO of the sentences, with
+# no dollar amount or percentage in the new ones ("last updated" stamps,
+# rotating promos), is ignored. The last RECRAWL_CHANGE_HISTORY changes are
+# kept on the offer.
+RECRAWL_ENABLED = True
+RECRAWL_INTERVAL_SECONDS = 24 * 60 * 60
+RECRAWL_RATE_PER_MINUTE = 2
+RECRAWL_MIN_CHANGE_RATIO = 0.1
+RECRAWL_CHANGE_HISTORY = 10
+
+# Record/replay of page fetches and OpenAI calls, set with OFFER_REPLAY_MODE:
+# 'record' saves every response into the REPLAY_ARCHIVE zip, 'replay' answers
+# from it without touching the network, 'off' leaves both alone
+REPLAY_MODE = os.environ.get('OFFER_REPLAY_MODE', 'off')
+REPLAY_ARCHIVE = os.environ.get('OFFER_REPLAY_ARCHIVE', 'data/replay/archive.zip')
+
 # Context window size for AI queries
 CONTEXT_SIZE = 15000
 
+# Relevance-ranked context selection: pages longer than the budget are split
+# into passages and only the passages that best match the prompts are sent
+CONTEXT_TOKEN_BUDGET = 3000
+CONTEXT_PASSAGE_WORDS = 60
+
+# Rule-based pre-extraction results at or above this confidence skip the LLM
+RULE_CONFIDENCE_THRESHOLD = 0.85
+
+# Start the summary call alongside offer validation instead of after it, once
+# validation has run for SPECULATIVE_SUMMARY_HEAD_START seconds without an
+# answer. The summary is discarded when validation rejects the page.
+SPECULATIVE_SUMMARY = True
+SPECULATIVE_SUMMARY_HEAD_START = 0.5
+
+# Minimum seconds between storage saves while a long field is streaming in
+STREAM_SAVE_INTERVAL = 1.0
+# Minimum seconds between partial-text callbacks while a completion streams
+STREAM_PARTIAL_INTERVAL = 0.2
+
+# Provider routing: seconds to wait on the primary provider before sending a
+# hedged duplicate to the other one, used until enough latencies are recorded
+# to use the observed p95 instead
+HEDGE_DEFAULT_DELAYS = {
+    'validation': 8.0,
+    'field': 10.0,
+    'tier_validation': 15.0,
+    'summary': 45.0,
+    'considerations': 45.0,
+    'refresh': 15.0,
+    'validation_batch': 12.0,
+    'field_light': 6.0,
+    'default': 15.0,
+}
+HEDGE_MIN_SAMPLES = 5
+
+# Consecutive failures before a provider's circuit opens, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_RESET_SECONDS = 60.0
+
+# Offer validation prompts arriving within this window are sent as one
+# multi-page request, up to the item and character limits
+VALIDATION_BATCH_WINDOW = 0.25
+VALIDATION_BATCH_MAX_ITEMS = 8
+VALIDATION_BATCH_MAX_CHARS = 60000
+
+# Local offer classifier: empty pages, and error, captcha, maintenance or
+# login pages no longer than this many characters with no dollar amounts,
+# are rejected without asking the LLM
+OFFER_CLASSIFIER_MAX_REJECT_CHARS = 1000
+
 # Token limits for different types of AI calls
 SHORT_PROMPT_MAX_TOKENS = 4096
 LONG_PROMPT_MAX_TOKENS = 8192
 
+# Output token budget per call type. Calls made without a call type fall
+# back to the short/long limits above.
+OUTPUT_TOKEN_BUDGETS = {
+    'validation': 8,
+    'validation_batch': 64,
+    'field_light': 64,
+    'field': 512,
+    'tier_validation': 1024,
+    'summary': 4096,
+    'considerations': 2048,
+    'refresh': 512,
+}
+
+# Input token budget per call type. Prompts over budget are logged and
+# trimmed from the middle so the instructions at the end survive.
+INPUT_TOKEN_BUDGETS = {
+    'validation': 6000,
+    'validation_batch': 40000,
+    'field_light': 8000,
+    'field': 8000,
+    'tier_validation': 8000,
+    'summary': 12000,
+    'considerations': 12000,
+    'refresh': 8000,
+    'default': 16000,
+}
+
+# Context window per model in tokens, shared between prompt and output
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4.1': 1047576,
+    'gpt-4.1-mini': 1047576,
+    'gemini-2.5-flash': 1048576,
+    'gemini-2.5-pro': 1048576,
+    'default': 128000,
+}
+
+# USD per million tokens, used for per-offer cost accounting
+MODEL_PRICING = {
+    'gpt-4.1': {'input': 2.00, 'cached_input': 0.50, 'output': 8.00},
+    'gpt-4.1-mini': {'input': 0.40, 'cached_input': 0.10, 'output': 1.60},
+    'gemini-2.5-flash': {'input': 0.30, 'cached_input': 0.075, 'output': 2.50},
+    'gemini-2.5-pro': {'input': 1.25, 'cached_input': 0.31, 'output': 10.00},
+}
+
+# Short-answer fields extracted with the light model. An answer that fails
+# validation is asked again of the default model.
+LIGHT_MODEL_FIELDS = [
+    'bank_name', 'account_title', 'bonus_to_be_received', 'initial_deposit_amount',
+    'minimum_deposit_amount', 'num_required_deposits', 'deal_expiration_date',
+    'minimum_monthly_fee', 'fee_is_conditional', 'minimum_daily_balance_required',
+    'days_for_deposit', 'days_for_bonus', 'must_be_open_for', 'clawback_clause_present',
+]
+
 # Field extraction tasks with prompts
 FIELD_EXTRACTION_TASKS = [
     {"param_name": "bank_name", "prompt": "What is the name of the bank? Keep it concise - just the main bank name without lengthy descriptions or multiple banks listed."},
@@ -0,0 +1,80 @@
+import logging
+from functools import lru_cache
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+    tiktoken = None
+
+from src.utils.config import (
+    INPUT_TOKEN_BUDGETS,
+    MODEL_CONTEXT_WINDOWS,
+    OUTPUT_TOKEN_BUDGETS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Characters per token for English web text when no tokenizer is installed
+CHARS_PER_TOKEN = 4
+
+# Marker left where the middle of an oversized prompt was cut out
+TRIM_MARKER = "\n...\n"
+
+
+@lru_cache(maxsize=8)
+def _encoding(model_name):
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        # Gemini and unknown model names: close enough for budgeting
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model_name=None):
+    """Estimate the number of tokens in text, using tiktoken when it is installed."""
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        return len(_encoding(model_name or "gpt-4.1").encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def context_window(model_name):
+    """Total tokens the model accepts, prompt and output together."""
+    return MODEL_CONTEXT_WINDOWS.get(model_name, MODEL_CONTEXT_WINDOWS['default'])
+
+
+def output_token_budget(call_type, default):
+    return OUTPUT_TOKEN_BUDGETS.get(call_type, default)
+
+
+def input_token_budget(call_type, model_name, output_tokens):
+    """Prompt tokens allowed for a call: the call type's budget, capped by what the model has room for."""
+    budget = INPUT_TOKEN_BUDGETS.get(call_type, INPUT_TOKEN_BUDGETS['default'])
+    return max(0, min(budget, context_window(model_name) - output_tokens))
+
+
+def fit_prompt(prompt, call_type, model_name, output_tokens):
+    """Trim a prompt that is over its input budget, logging every time it happens.
+
+    Prompts put the shared page content first and the instructions last, so
+    the cut is taken from the middle and both ends are kept.
+    """
+    budget = input_token_budget(call_type, model_name, output_tokens)
+    tokens = count_tokens(prompt, model_name)
+    if tokens <= budget:
+        return prompt
+    logger.warning(f"Prompt for {call_type or 'untyped'} call to {model_name} is {tokens} tokens, "
+                   f"over its {budget} token budget; trimming")
+    # Scale by characters, then tighten until the estimate fits
+    keep_chars = int(len(prompt) * budget / tokens)
+    while keep_chars > 0:
+        head = keep_chars * 2 // 3
+        tail = keep_chars - head
+        trimmed = prompt[:head] + TRIM_MARKER + (prompt[-tail:] if tail else "")
+        if count_tokens(trimmed, model_name) <= budget:
+            return trimmed
+        keep_chars = int(keep_chars * 0.9)
+    return prompt[-budget * CHARS_PER_TOKEN:] if budget else ""
@@ -0,0 +1,65 @@
+from src.core.context_selection import BM25, rank_passages, select_context, split_passages, tokenize
+
+
+PASSAGES = [
+    "Open a new checking account and earn a $300 cash bonus.",
+    "Our branches are open Monday through Friday. Find a branch near you.",
+    "To earn the bonus, make direct deposits totaling $500 within 90 days.",
+    "Mortgage rates and home equity lines of credit.",
+]
+
+
+def test_tokenize_drops_stopwords_and_keeps_amounts():
+    assert tokenize("Earn the $1,500.00 bonus within 90 days") == ['earn', '1500.00', 'bonus', '90', 'days']
+
+
+def test_bm25_ranks_matching_passages_first():
+    scores = BM25(PASSAGES).scores("direct deposit bonus days")
+
+    assert scores.index(max(scores)) == 2
+    assert scores[3] == 0.0
+
+
+def test_bm25_rare_terms_outweigh_common_ones():
+    index = BM25(PASSAGES)
+
+    # 'bonus' is in two passages, 'mortgage' in one
+    assert index.scores("mortgage")[3] > index.scores("bonus")[0]
+
+
+def test_bm25_with_no_passages():
+    assert BM25([]).scores("bonus") == []
+
+
+def test_rank_passages_normalizes_each_query():
+    scores = rank_passages(PASSAGES, ["cash bonus", "branch hours monday"])
+
+    assert max(scores) <= 2.0
+    assert scores[0] > 0 and scores[1] > 0
+    assert scores[3] == 0.0
+
+
+def test_split_passages_breaks_unpunctuated_text():
+    passages = split_passages(" ".join(["word"] * 25), passage_words=10)
+
+    assert [len(passage.split()) for passage in passages] == [10, 10, 5]
+
+
+def test_select_context_returns_small_pages_unchanged():
+    page_text = " ".join(PASSAGES)
+
+    assert select_context(page_text, ["bonus"]) == page_text
+
+
+def test_select_context_keeps_relevant_passages_in_page_order():
+    filler = [f"Filler sentence number {i} about branch hours and locations." for i in range(200)]
+    page_text = " ".join(filler[:100] + [PASSAGES[2]] + filler[100:] + [PASSAGES[0]])
+
+    context = select_context(page_text, ["direct deposits bonus", "cash bonus"], token_budget=250, max_chars=1000)
+
+    assert "direct deposits totaling $500" in context
+    assert "$300 cash bonus" in context
+    assert context.index("direct deposits") < context.index("cash bonus")
+    # The two passages are far apart on the page
+    assert "\n...\n" in context
+    assert len(context) <= 1000
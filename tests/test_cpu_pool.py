@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(text):
+    """Runs in a worker: which of the app's heavy modules it has imported."""
+    return sorted(name for name in ('src.services.ai_clients', 'src.core.scraping', 'openai') if name in sys.modules)
+
+
+def test_worker_does_not_rerun_the_main_script(tmp_path):
+    # A main script that, like app.py, sets up the AI clients at import time.
+    # Only the parent may print 'main script ran'
+    script = tmp_path / 'main_script.py'
+    script.write_text(textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {REPO_DIR!r})
+        print("main script ran")
+        import src.services.ai_clients
+
+        if __name__ == '__main__':
+            from src.core.cpu_pool import get_cpu_pool_stats, run_cpu
+            from tests.test_cpu_pool import loaded_modules
+            print(run_cpu(loaded_modules, "x" * 50000))
+            print(get_cpu_pool_stats()['pooled'])
+    """))
+
+    result = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120, cwd=REPO_DIR)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["main script ran", "[]", "1"]
@@ -0,0 +1,58 @@
+import pytest
+
+field_refresh = pytest.importorskip("src.core.field_refresh")
+
+
+@pytest.fixture
+def offer(monkeypatch):
+    offers = {1: {'id': 1, 'details': {'bonus_to_be_received': '200'}, 'refresh_status': {}}}
+    monkeypatch.setattr(field_refresh, 'offers', offers)
+    monkeypatch.setattr(field_refresh, 'save_offer', lambda offer_id: None)
+    monkeypatch.setattr(field_refresh, 'store_offer_usage', lambda offer, offer_id: None)
+    monkeypatch.setattr(field_refresh.time, 'sleep', lambda seconds: None)
+    return offers[1]
+
+
+def stub_calls(monkeypatch, samples, consensus="300"):
+    prompts = []
+
+    def call_routed(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return consensus
+
+    monkeypatch.setattr(field_refresh, 'call_ai_samples', lambda *args, **kwargs: list(samples))
+    monkeypatch.setattr(field_refresh, 'call_routed', call_routed)
+    return prompts
+
+
+def test_agreeing_samples_skip_consensus(monkeypatch, offer):
+    prompts = stub_calls(monkeypatch, ["300", "$300", "300"])
+
+    field_refresh._refresh_field(1, 'bonus_to_be_received', "Earn a $300 bonus.")
+
+    assert prompts == []
+    assert offer['details']['bonus_to_be_received'] == '300'
+    assert offer['field_confidence']['bonus_to_be_received'] == {'source': 'llm_consensus', 'confidence': 1.0}
+    assert 'bonus_to_be_received' not in offer['refresh_status']
+
+
+def test_disagreeing_samples_go_to_consensus(monkeypatch, offer):
+    prompts = stub_calls(monkeypatch, ["300", "500", "300"], consensus="$300")
+
+    field_refresh._refresh_field(1, 'bonus_to_be_received', "Earn a $300 bonus.")
+
+    assert len(prompts) == 1
+    assert "Answer 2: 500" in prompts[0]
+    assert offer['details']['bonus_to_be_received'] == '300'
+    assert offer['field_confidence']['bonus_to_be_received']['confidence'] == 0.67
+
+
+def test_failed_samples_are_not_counted_as_agreement(monkeypatch, offer):
+    prompts = stub_calls(monkeypatch, ["300", "AI Error: timeout"])
+
+    field_refresh._refresh_field(1, 'bonus_to_be_received', "Earn a $300 bonus.")
+
+    assert len(prompts) == 1
+    assert "Answer 3: No answer" in prompts[0]
+    assert offer['details']['bonus_to_be_received'] == '300'
+    assert offer['field_confidence']['bonus_to_be_received']['confidence'] == 1.0
@@ -0,0 +1,91 @@
+from src.core.html_text import TextBlock, html_to_text, reduce_blocks
+
+
+def block(text, link_chars=0, heading=False, hinted=False, cell=False):
+    return TextBlock(text, link_chars, heading, hinted, cell)
+
+
+def texts(blocks):
+    return [b.text for b in blocks]
+
+
+PARAGRAPH = "Open a new checking account and earn a $300 bonus with qualifying direct deposits."
+
+
+def test_link_heavy_blocks_are_dropped():
+    menu = "Checking Savings Credit Cards Mortgages"
+    kept, stats = reduce_blocks([block(menu, link_chars=len(menu)), block(PARAGRAPH)])
+
+    assert texts(kept) == [PARAGRAPH]
+    assert stats['boilerplate_blocks'] == 1
+
+
+def test_link_heavy_blocks_with_amounts_are_kept():
+    offer_link = "Get a $300 bonus"
+    kept, _ = reduce_blocks([block(offer_link, link_chars=len(offer_link)), block(PARAGRAPH)])
+
+    assert texts(kept) == [offer_link, PARAGRAPH]
+
+
+def test_hinted_blocks_are_dropped():
+    kept, _ = reduce_blocks([block("We use cookies to improve your experience on our site.", hinted=True),
+                             block(PARAGRAPH)])
+
+    assert texts(kept) == [PARAGRAPH]
+
+
+def test_short_caption_between_boilerplate_goes_with_it():
+    products = "Checking Savings Credit Cards Mortgages"
+    services = "Personal Business Commercial Wealth"
+    blocks = [block(products, link_chars=len(products)), block("Menu"),
+              block(services, link_chars=len(services)), block(PARAGRAPH)]
+
+    kept, _ = reduce_blocks(blocks)
+
+    assert texts(kept) == [PARAGRAPH]
+
+
+def test_repeated_paragraphs_are_kept_once():
+    kept, stats = reduce_blocks([block(PARAGRAPH), block("Terms apply to this offer only."), block(PARAGRAPH)])
+
+    assert texts(kept) == [PARAGRAPH, "Terms apply to this offer only."]
+    assert stats['duplicate_blocks'] == 1
+
+
+def test_repeated_table_cells_are_kept():
+    cells = ["$1,000", "$200", "$5,000", "$200"]
+    kept, stats = reduce_blocks([block(PARAGRAPH)] + [block(text, cell=True) for text in cells])
+
+    assert texts(kept) == [PARAGRAPH] + cells
+    assert stats['duplicate_blocks'] == 0
+
+
+def test_removal_is_skipped_when_too_little_text_would_remain():
+    menu = "Checking Savings Credit Cards Mortgages Auto Loans Investing Insurance Help Sign In"
+    kept, _ = reduce_blocks([block(menu, link_chars=len(menu)), block("Bonus")], min_keep_ratio=0.5)
+
+    assert texts(kept) == [menu, "Bonus"]
+
+
+def test_stats_report_the_reduction():
+    menu = "Checking Savings Credit Cards Mortgages"
+    _, stats = reduce_blocks([block(menu, link_chars=len(menu)), block(PARAGRAPH)])
+
+    assert stats['blocks'] == 2
+    assert stats['original_chars'] == len(menu) + 1 + len(PARAGRAPH)
+    assert stats['kept_chars'] == len(PARAGRAPH)
+    assert 0 < stats['reduction_ratio'] < 1
+
+
+def test_html_to_text_keeps_tier_table():
+    html = f"""<html><body>
+    <nav><a href="/c">Checking</a> <a href="/s">Savings</a> <a href="/m">Mortgages</a></nav>
+    <p>{PARAGRAPH}</p>
+    <table><tr><td>Deposit $1,000</td><td>$200</td></tr><tr><td>Deposit $5,000</td><td>$200</td></tr></table>
+    </body></html>"""
+
+    text = html_to_text(html)
+
+    assert PARAGRAPH in text
+    assert text.count("$200") == 2
+    assert "Mortgages" not in text
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from src.core.offer_classifier import classify_offer_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+PAGES = [
+    os.path.join(FIXTURES_DIR, folder, filename)
+    for folder in ('classifier_tuning', 'offer_pages')
+    for filename in sorted(os.listdir(os.path.join(FIXTURES_DIR, folder)))
+    if filename.endswith('.txt')
+]
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+def test_local_decisions_are_never_wrong(path):
+    with open(path, encoding='utf-8') as f:
+        verdict, _ = classify_offer_page(f.read())
+
+    expected = 'not_offer' if os.path.basename(path).startswith('not_offer') else 'offer'
+    assert verdict in (expected, 'uncertain')
+
+
+@pytest.mark.parametrize("page_text, expected", [
+    ("", ('not_offer', 'empty_page')),
+    ("Page Not Found\nSorry, this page doesn't exist.", ('not_offer', 'not_found')),
+    ("Online Banking\nUsername\nPassword\nLog in", ('not_offer', 'login_form')),
+    ("Open a new checking account and earn a $300 bonus after direct deposits of $500.", ('offer', 'bonus_terms')),
+    # The same terms on a page that says they are over
+    ("This offer has ended. Open a new checking account and earn a $300 bonus after direct deposits of $500.",
+     ('uncertain', None)),
+    # A card bonus: no checking or savings account to open
+    ("Earn a $200 cash bonus after you spend $500 in the first 3 months from account opening.", ('uncertain', None)),
+])
+def test_classify_offer_page(page_text, expected):
+    assert classify_offer_page(page_text) == expected
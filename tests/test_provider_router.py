@@ -0,0 +1,168 @@
+import threading
+import time
+
+from src.services.provider_router import CircuitBreaker, ProviderRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def provider(name, answer, delay=0.0, calls=None):
+    def call():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        return answer
+    return name, call
+
+
+def failing(name, calls=None):
+    return provider(name, "AI Error: 429", calls=calls)
+
+
+def test_first_provider_answers_without_a_hedge():
+    router = ProviderRouter(default_delays={'default': 1.0})
+    calls = []
+
+    result = router.call('field', [provider('openai', "300", calls=calls), provider('gemini', "500", calls=calls)])
+
+    assert result == "300"
+    assert calls == ['openai']
+    assert router.stats['hedges_sent'] == 0
+
+
+def test_hedge_fires_after_p95():
+    router = ProviderRouter(default_delays={'default': 10.0})
+    for _ in range(10):
+        router.latency.record('openai', 'field', 0.05)
+    assert router.hedge_delay('openai', 'field') == 0.05
+
+    started = time.monotonic()
+    result = router.call('field', [provider('openai', "slow", delay=1.0), provider('gemini', "fast")])
+
+    assert result == "fast"
+    assert time.monotonic() - started < 0.5
+    assert router.stats['hedges_sent'] == 1
+    assert router.stats['hedge_wins'] == 1
+
+
+def test_first_good_answer_wins_over_a_later_one():
+    router = ProviderRouter(default_delays={'default': 0.05})
+
+    result = router.call('field', [provider('openai', "primary", delay=0.2), provider('gemini', "hedge", delay=0.6)])
+
+    assert result == "primary"
+    assert router.stats['hedges_sent'] == 1
+    assert router.stats['hedge_wins'] == 0
+
+
+def test_failed_primary_falls_back_without_waiting_for_the_hedge():
+    router = ProviderRouter(default_delays={'default': 10.0})
+
+    result = router.call('field', [failing('openai'), provider('gemini', "500")])
+
+    assert result == "500"
+    assert router.stats['fallbacks'] == 1
+
+
+def test_no_hedge_for_streamed_calls():
+    router = ProviderRouter(default_delays={'default': 0.01})
+    calls = []
+
+    result = router.call('field', [provider('openai', "300", delay=0.1, calls=calls),
+                                   provider('gemini', "500", calls=calls)], hedge=False)
+
+    assert result == "300"
+    assert calls == ['openai']
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker('openai', failure_threshold=3, reset_timeout=60.0, clock=clock)
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow_request()
+
+    clock.now = 60.0
+    assert breaker.allow_request()
+    assert breaker.state == 'half_open'
+    # Only one trial call at a time
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker('openai', failure_threshold=3, reset_timeout=60.0, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 60.0
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == 'open'
+    assert breaker.opened_at == 60.0
+    assert not breaker.allow_request()
+
+
+def test_open_provider_is_skipped_when_another_is_allowed():
+    clock = FakeClock()
+    router = ProviderRouter(default_delays={'default': 10.0},
+                            breaker_factory=lambda name: CircuitBreaker(name, failure_threshold=1, clock=clock))
+    calls = []
+    router.call('field', [failing('openai', calls=calls), failing('gemini', calls=calls)])
+    router.breaker('gemini').record_success()
+    calls.clear()
+
+    result = router.call('field', [provider('openai', "300", calls=calls), provider('gemini', "500", calls=calls)])
+
+    assert result == "500"
+    assert calls == ['gemini']
+    assert router.stats['skipped_open_circuit'] == 1
+
+
+def test_single_provider_is_still_tried_with_an_open_circuit():
+    clock = FakeClock()
+    router = ProviderRouter(default_delays={'default': 10.0},
+                            breaker_factory=lambda name: CircuitBreaker(name, failure_threshold=3, clock=clock))
+    for _ in range(3):
+        router.call('field', [failing('openai')])
+    assert router.breaker('openai').state == 'open'
+
+    result = router.call('field', [provider('openai', "300")])
+
+    assert result == "300"
+    assert router.breaker('openai').state == 'closed'
+    assert router.stats['forced_open_circuit'] == 1
+
+
+def test_parallel_calls_each_get_an_answer():
+    router = ProviderRouter(default_delays={'default': 10.0})
+    results = []
+
+    def call():
+        results.append(router.call('field', [provider('openai', "300", delay=0.1)]))
+
+    threads = [threading.Thread(target=call) for _ in range(20)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["300"] * 20
+    # Calls don't queue behind a worker pool
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,73 @@
+import pytest
+
+from src.core.rule_extraction import FIELD_PATTERNS, extract_field, pre_extract_fields, settled_fields
+from src.utils.config import RULE_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("field_name, page_text, expected", [
+    ('minimum_deposit_amount', "Make qualifying direct deposits totaling $500 or more.", '500'),
+    ('minimum_deposit_amount', "Direct deposits totaling $1,500.00 are required.", '1500'),
+    ('minimum_deposit_amount', "A minimum direct deposit of $250 is required.", '250'),
+    ('days_for_deposit', "Make direct deposits totaling $500 within 90 days of account opening.", '90'),
+    ('days_for_deposit', "You must make deposits within 60 business days after enrollment.", '60'),
+    ('must_be_open_for', "The account must remain open for 90 days.", '90'),
+    ('must_be_open_for', "Keep your account open for at least six months.", '180'),
+    ('must_be_open_for', "Your account must be open for 6 months to receive the bonus.", '180'),
+    ('must_be_open_for', "The account must stay open for 90 days.", '90'),
+    ('must_be_open_for', "If the account is closed within 6 months of account opening, the bonus is deducted.", '180'),
+    ('deal_expiration_date', "Offer expires 12/31/2026.", '2026-12-31'),
+    ('deal_expiration_date', "This offer ends on March 15, 2026.", '2026-03-15'),
+    ('deal_expiration_date', "Open a new checking account by 2026-06-30.", '2026-06-30'),
+])
+def test_patterns_match_clear_phrasings(field_name, page_text, expected):
+    result = extract_field(field_name, page_text)
+
+    assert result['value'] == expected
+    assert result['source'] == 'rules'
+    assert result['confidence'] >= RULE_CONFIDENCE_THRESHOLD
+    assert result['evidence'] in page_text
+
+
+@pytest.mark.parametrize("page_text", [
+    "Earn up to $500 when you open an account.",
+    "Earn a bonus on direct deposits of up to $2,000.",
+    "Qualifying deposits of up to $5,000 earn 1%.",
+    "Make two direct deposits within 60 days.",
+    "Within 90 days you'll be able to see deposits.",
+    "Open for business 90 days a year.",
+    "Our branches will be open 7 days a week.",
+    "Our lobby will remain open for 6 days a week.",
+    "Offer expires soon.",
+    "Bonus is valid through the end of the quarter.",
+    "Offer expires 02/30/2026.",
+])
+def test_near_misses_are_left_to_the_llm(page_text):
+    assert pre_extract_fields(page_text) == {}
+
+
+def test_repeated_mentions_raise_confidence():
+    page_text = ("Make direct deposits totaling $500 within 90 days of account opening. "
+                 "Direct deposits of at least $500 are required.")
+
+    assert extract_field('minimum_deposit_amount', page_text)['confidence'] > \
+        extract_field('minimum_deposit_amount', "Direct deposits totaling $500 are required.")['confidence']
+
+
+def test_tiered_amounts_are_not_settled():
+    page_text = ("Get up to $3,000 with qualifying deposits. Earn $300 with direct deposits of $1,000; "
+                 "earn $600 with direct deposits of $5,000.")
+
+    result = extract_field('minimum_deposit_amount', page_text)
+    assert result['confidence'] < RULE_CONFIDENCE_THRESHOLD
+    assert 'minimum_deposit_amount' not in settled_fields(page_text)
+
+
+def test_settled_fields_applies_threshold():
+    page_text = "Make qualifying direct deposits totaling $500 or more within 90 days of account opening."
+
+    assert set(settled_fields(page_text)) == {'minimum_deposit_amount', 'days_for_deposit'}
+    assert settled_fields(page_text, threshold=0.99) == {}
+
+
+def test_empty_page_extracts_nothing():
+    assert all(extract_field(field_name, "") is None for field_name in FIELD_PATTERNS)